@@ -0,0 +1,207 @@
+"""
+Monte Carlo autoplayer for Trash Tosser
+
+Finds an angle and power that land the trash in its matching bin by throwing thousands of random candidates at the
+layout across a pool of worker processes, each solving its share with batch.solve_throws. The throws that score are
+then refined by throwing again around them and moving towards the middle of the area that scores, so the final aim
+still scores when it is only reached to within a step of the aiming keys.
+
+In the game it is used for the assist mode (showing the trajectory of a throw that would score) and the bot mode
+(aiming and throwing by itself). From the command line it scores how difficult random layouts are:
+    python autoplayer.py --layouts 100 --processes 32
+"""
+import os
+import sys
+import json
+import argparse
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+import batch
+import simulation
+from simulation import MIN_POWER, MAX_POWER, SCORED
+
+# Result of a search, hit_rate is the fraction of throws around the aim that scored
+Aim = namedtuple("Aim", ["angle", "power", "hit_rate"])
+
+# How far from the aim the refining throws are spread, about the size of a step of the aiming keys
+ANGLE_SPREAD = 1.5
+POWER_SPREAD = 0.03
+
+
+def solve_chunk(layout, type, angles, powers):
+    """Worker process entry point, throws every (angle, power) pair at the layout of (x, type) bins"""
+    bins = [simulation.Bin(x, bin_type) for x, bin_type in layout]
+    results, _ = batch.solve_throws(bins, type, angles, powers)
+    return results
+
+
+def aim_inputs(trash, aim):
+    """
+    :return inputs: int:
+    The input bitmask that moves the trash's aim towards the target aim, launching it once it is close enough
+    """
+    inputs = 0
+    angle = aim.angle - trash.aim_angle()
+    power = aim.power - trash.power
+
+    if abs(angle) > 0.3:
+        inputs |= simulation.LEFT if angle > 0 else simulation.RIGHT
+    if abs(power) > 0.006:
+        inputs |= simulation.UP if power > 0 else simulation.DOWN
+    if not inputs:
+        return simulation.LAUNCH
+
+    # Hold shift for the last few degrees and power steps so the aim doesn't overshoot
+    if abs(angle) < 3 and abs(power) < 0.06:
+        inputs |= simulation.SHIFT
+    return inputs
+
+
+class Autoplayer:
+    """
+    Searches for throws that score using a pool of worker processes
+
+    Attributes:
+        processes: int
+            Number of worker processes, 1 solves everything in this process
+
+        samples: int
+            Number of random throws across the whole aim space in the first round of a search
+
+        rounds: int, candidates: int, neighbours: int
+            Number of refining rounds, scoring throws refined in each round, and throws around each of them
+
+    Methods:
+        solve(bins: list[simulation.Bin], type: int, angles: array, powers: array) -> array
+            Throws every (angle, power) pair, split across the worker processes
+
+        search(bins: list[simulation.Bin], type: int, seed: int) -> Aim
+            Finds a throw that scores, or None if none of the samples scored
+
+        submit(bins: list[simulation.Bin], type: int, seed: int) -> Future
+            Runs search in the background so the game loop doesn't wait for it
+
+        difficulty(bins: list[simulation.Bin], type: int, seed: int) -> float
+            Fraction of the aim space that doesn't score, from 0 (anything scores) to 1 (nothing does)
+
+        close()
+            Shuts down the worker processes
+    """
+    def __init__(self, processes=None, samples=4096, rounds=3, candidates=8, neighbours=64):
+        self.processes = processes or os.cpu_count() or 1
+        self.samples = samples
+        self.rounds = rounds
+        self.candidates = candidates
+        self.neighbours = neighbours
+
+        self.pool = None
+        self.background = None
+
+    def solve(self, bins, type, angles, powers):
+        layout = [(bin.x, bin.type) for bin in bins]
+        if self.processes == 1:
+            return solve_chunk(layout, type, angles, powers)
+
+        # Workers are spawned rather than forked so they don't inherit the game's window and threads
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+
+        chunks = zip(np.array_split(angles, self.processes), np.array_split(powers, self.processes))
+        futures = [self.pool.submit(solve_chunk, layout, type, chunk_angles, chunk_powers)
+                   for chunk_angles, chunk_powers in chunks if chunk_angles.size]
+        return np.concatenate([future.result() for future in futures])
+
+    def sample(self, rng, count):
+        angles = rng.uniform(-90, 90, count)
+        powers = rng.uniform(MIN_POWER, MAX_POWER, count)
+        return angles, powers
+
+    def search(self, bins, type, seed=None):
+        rng = np.random.default_rng(seed)
+
+        # Throw at random across the whole aim space
+        angles, powers = self.sample(rng, self.samples)
+        hits = self.solve(bins, type, angles, powers) == SCORED
+        if not hits.any():
+            return None
+
+        # Start refining from a few of the throws that scored
+        picks = rng.choice(np.flatnonzero(hits), min(self.candidates, int(hits.sum())), replace=False)
+        centres = np.stack([angles[picks], powers[picks]], axis=1)
+
+        best = None
+        for _ in range(self.rounds):
+            # Throw around every centre at once
+            count = len(centres)
+            offsets = rng.normal(size=(count, self.neighbours, 2)) * (ANGLE_SPREAD, POWER_SPREAD)
+            around = centres[:, None, :] + offsets
+            around[..., 0] = np.clip(around[..., 0], -90, 90)
+            around[..., 1] = np.clip(around[..., 1], MIN_POWER, MAX_POWER)
+
+            scored = (self.solve(bins, type, around[..., 0].ravel(), around[..., 1].ravel()) == SCORED)
+            scored = scored.reshape(count, self.neighbours)
+            rates = scored.mean(axis=1)
+
+            top = int(np.argmax(rates))
+            if best is None or rates[top] >= best.hit_rate:
+                best = Aim(float(centres[top, 0]), float(centres[top, 1]), float(rates[top]))
+
+            # Move each centre to the middle of the throws around it that scored, keeping the better half
+            keep = np.argsort(-rates)[:max(1, count // 2)]
+            centres = np.stack([
+                around[i][scored[i]].mean(axis=0) if scored[i].any() else centres[i]
+                for i in keep
+            ])
+
+        return best
+
+    def submit(self, bins, type, seed=None):
+        if self.background is None:
+            self.background = ThreadPoolExecutor(1)
+        return self.background.submit(self.search, list(bins), type, seed)
+
+    def difficulty(self, bins, type, seed=None):
+        angles, powers = self.sample(np.random.default_rng(seed), self.samples)
+        return 1 - float(np.mean(self.solve(bins, type, angles, powers) == SCORED))
+
+    def close(self):
+        if self.background is not None:
+            self.background.shutdown(cancel_futures=True)
+            self.background = None
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score how difficult random Trash Tosser layouts are")
+    parser.add_argument("--layouts", type=int, default=10, help="number of layouts to score")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first layout, the rest count up from it")
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to one per core")
+    parser.add_argument("--samples", type=int, default=20000, help="throws per layout and trash type")
+    args = parser.parse_args(argv)
+
+    player = Autoplayer(args.processes, samples=args.samples)
+    try:
+        for seed in range(args.seed, args.seed + args.layouts):
+            sim = simulation.Simulation(seed)
+            for type in range(3):
+                aim = player.search(sim.bins, type, seed)
+                print(json.dumps({
+                    "seed": seed,
+                    "bins": [(bin.x, bin.type) for bin in sim.bins],
+                    "type": type,
+                    "difficulty": round(player.difficulty(sim.bins, type, seed), 4),
+                    "aim": aim._asdict() if aim else None,
+                }))
+    finally:
+        player.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,207 @@
+"""
+Vectorized trajectory solver for Trash Tosser
+
+Solves many throws at once using NumPy arrays instead of one simulation.Trash at a time.
+The maths is the same as Trash.update (same parabola, same bounce, stop and bin impact rules) so a throw solved here
+ends the same way as simulation.simulate_throw, only thousands of them are solved per call.
+Throws jump straight from one event (bounce, bin hit, leaving the screen) to the next, so the work depends on the
+number of bounces rather than the number of frames a throw takes.
+Used to sweep the whole aim space (angle x power) for a bin layout.
+"""
+import numpy as np
+
+from simulation import (SIZE_X, GRAVITY, BASE_PLAYER_SIZE, TRAJECTORY_BALLS, FLOOR,
+                        MIN_POWER, MAX_POWER, SCORED, WRONG_BIN, STOPPED)
+
+# Starting position and velocity of every throw, the same as Trash.reset
+START_X, START_Y = 20, 400
+INITIAL_LENGTH = float(np.hypot(10, -10))
+
+
+def launch_velocities(angles, powers):
+    """
+    Returns (vx, vy) arrays for the given launch angles in degrees above the horizontal and power scalars
+    The same as Trash.aim for each pair
+    """
+    powers = np.clip(np.asarray(powers, dtype=np.float64), MIN_POWER, MAX_POWER)
+    radians = np.radians(np.asarray(angles, dtype=np.float64))
+    speed = INITIAL_LENGTH * powers
+    return np.cos(radians) * speed, -np.sin(radians) * speed
+
+
+def predict_trajectories(x, y, vx, vy, balls=TRAJECTORY_BALLS, spacing=1):
+    """
+    Predicted trajectory orb centres for many throws at once, the same formula as Trash.trajectory
+
+    Returns two arrays of shape (throws, balls) holding the x and y of each orb
+    """
+    i = np.arange(balls, dtype=np.float64) * spacing
+    x = np.asarray(x, dtype=np.float64)[..., None]
+    y = np.asarray(y, dtype=np.float64)[..., None]
+    vx = np.asarray(vx, dtype=np.float64)[..., None]
+    vy = np.asarray(vy, dtype=np.float64)[..., None]
+    return x + BASE_PLAYER_SIZE/2 + i*vx, y + BASE_PLAYER_SIZE/2 + i*(vy + 0.5*GRAVITY*i)
+
+
+def roots(b, c):
+    """Vectorized simulation.roots for a = GRAVITY/2"""
+    a = GRAVITY/2
+    discriminant = b*b - 4*a*c
+    real = discriminant >= 0
+    discriminant = np.sqrt(np.where(real, discriminant, 0))
+    low = np.where(real, (-b - discriminant) / (2*a), np.inf)
+    high = np.where(real, (-b + discriminant) / (2*a), np.inf)
+    return low, high
+
+
+def floor_times(y, vy):
+    """Vectorized simulation.floor_time"""
+    _, time = roots(vy, y - FLOOR)
+    return np.where(time > 0, time, np.where(y >= FLOOR, 0, np.inf))
+
+
+def wall_times(x, vx):
+    """Vectorized simulation.wall_time"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        left = np.maximum(-x / vx, 0)
+        right = np.maximum((SIZE_X - x) / vx, 0)
+    outside = (0 > x) | (x > SIZE_X)
+    return np.where(vx < 0, left, np.where(vx > 0, right, np.where(outside, 0, np.inf)))
+
+
+def times_of_impact(x, y, vx, vy, rect, end):
+    """Vectorized simulation.time_of_impact, with np.inf where the rect isn't hit before end"""
+    left, top, width, height = rect
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        first = (left - BASE_PLAYER_SIZE - x) / vx
+        second = (left + width - x) / vx
+    inside = (left - BASE_PLAYER_SIZE < x) & (x < left + width)
+    still = vx == 0
+    x_start = np.where(still, np.where(inside, -np.inf, np.inf), np.minimum(first, second))
+    x_end = np.where(still, np.where(inside, np.inf, -np.inf), np.maximum(first, second))
+
+    above_low, above_high = roots(vy, y - (top + height))
+    below_low, below_high = roots(vy, y - (top - BASE_PLAYER_SIZE))
+
+    # Before the trash rises above the top of the rect, then after it falls back below it
+    start = np.maximum(np.maximum(above_low, x_start), 0)
+    stop = np.minimum(np.minimum(np.minimum(above_high, below_low), x_end), end)
+    time = np.where(start < stop, start, np.inf)
+
+    start = np.maximum(np.maximum(np.maximum(above_low, below_high), x_start), 0)
+    stop = np.minimum(np.minimum(above_high, x_end), end)
+    return np.where(np.isinf(time) & (start < stop), start, time)
+
+
+def advance(x, y, vx, vy, dt, bins):
+    """
+    Vectorized Trash.update for many pieces of trash in flight, updating the arrays in place
+
+    :param x, y, vx, vy: arrays:
+    Positions and velocities of every piece, pieces that aren't moving are left alone
+
+    :param dt: float or array:
+    How many frames to move each piece for
+
+    :param bins: list[simulation.Bin]:
+    Bins the pieces can hit, the first bin in the list wins ties
+
+    :return hit, elapsed: (array, array):
+    Index into bins of the bin each piece hit, or -1, and how far into the step it hit or stopped
+    """
+    count = x.size
+    dt = np.broadcast_to(np.asarray(dt, dtype=np.float64), count)
+    hit = np.full(count, -1, dtype=np.int32)
+    elapsed = np.zeros(count, dtype=np.float64)
+
+    active = np.flatnonzero((vx != 0) | (vy != 0))
+    while active.size:
+        ax, ay, avx, avy = x[active], y[active], vx[active], vy[active]
+
+        # Earliest of hitting the floor, leaving the screen and using up the step
+        floor = floor_times(ay, avy)
+        wall = wall_times(ax, avx)
+        event = np.minimum(np.minimum(floor, wall), dt[active] - elapsed[active])
+
+        # Bins hit strictly before the earliest event replace it
+        ahit = np.full(active.size, -1, dtype=np.int32)
+        for i, bin in enumerate(bins):
+            time = times_of_impact(ax, ay, avx, avy, bin.collider, event)
+            closer = time < event
+            ahit[closer] = i
+            event = np.where(closer, time, event)
+
+        # Move every piece along its parabola to its event
+        ax = ax + avx*event
+        ay = ay + avy*event + GRAVITY/2*event*event
+        avy = avy + GRAVITY*event
+        elapsed[active] += event
+
+        # Leaving the screen stops the piece
+        ended = ahit >= 0
+        out = ~ended & (event == wall)
+        avx = np.where(out, 0, avx)
+        avy = np.where(out, 0, avy)
+
+        # Landing slowly stops the piece, anything else bounces
+        landed = ~ended & ~out & (event == floor)
+        ay = np.where(landed, FLOOR, ay)
+        slow = landed & (np.abs(avx) < 5) & (np.abs(avy) < 5)
+        bounce = landed & ~slow
+        avx = np.where(slow, 0, np.where(bounce, avx*0.66, avx))
+        avy = np.where(slow, 0, np.where(bounce, avy*-0.8, avy))
+
+        x[active], y[active], vx[active], vy[active] = ax, ay, avx, avy
+        hit[active] = ahit
+
+        done = ended | ((avx == 0) & (avy == 0)) | (elapsed[active] >= dt[active])
+        active = active[~done]
+
+    return hit, elapsed
+
+
+def solve_throws(bins, types, angles, powers, max_frames=10000):
+    """
+    Throws every (angle, power) pair at the bins simultaneously
+
+    :param bins: list[simulation.Bin]:
+    The layout to throw at
+
+    :param types: int or array:
+    Trash type of each throw, broadcast against the angles and powers
+
+    :return results, times: (array, array):
+    SCORED, WRONG_BIN or STOPPED for each throw and how many frames into the throw it happened,
+    in the shape of the broadcast inputs
+    """
+    angles, powers, types = np.broadcast_arrays(
+        np.asarray(angles, dtype=np.float64),
+        np.asarray(powers, dtype=np.float64),
+        np.asarray(types)
+    )
+    shape = angles.shape
+
+    vx, vy = launch_velocities(angles.ravel(), powers.ravel())
+    x = np.full(vx.size, START_X, dtype=np.float64)
+    y = np.full(vx.size, START_Y, dtype=np.float64)
+
+    # The outcome doesn't depend on the step size so each throw is solved in one go
+    hit, times = advance(x, y, vx, vy, max_frames, bins)
+
+    bin_types = np.array([bin.type for bin in bins] + [-1])
+    results = np.where(hit < 0, STOPPED, np.where(types.ravel() == bin_types[hit], SCORED, WRONG_BIN)).astype(np.int8)
+    return results.reshape(shape), times.reshape(shape)
+
+
+def sweep(bins, type, angle_steps=181, power_steps=51, max_frames=10000):
+    """
+    Solves a grid of throws covering the whole aim space, angles from -90 to 90 degrees and powers from MIN_POWER to MAX_POWER
+
+    :return angles, powers, results, times:
+    1D arrays of the angles and powers sampled and 2D arrays of shape (angle_steps, power_steps) with the outcome of each throw
+    """
+    angles = np.linspace(-90, 90, angle_steps)
+    powers = np.linspace(MIN_POWER, MAX_POWER, power_steps)
+    results, times = solve_throws(bins, type, angles[:, None], powers[None, :], max_frames)
+    return angles, powers, results, times
@@ -0,0 +1,331 @@
+"""
+Frame time benchmarks for Trash Tosser
+
+Runs each part of a frame on its own under SDL's dummy video driver, so no window is needed, and reports the mean,
+95th and 99th percentile time per call along with the memory allocated while running it.
+The garbage collector is turned off while timing and the calls are split into several runs, reporting the median of
+each metric over the runs, so a collection or the machine being busy for a moment doesn't decide the result.
+Results are printed as JSON, and compared against the limits in benchmark_thresholds.json so the run fails if
+anything got slower.
+
+    python benchmark.py                        Run every benchmark and check the thresholds
+    python benchmark.py trash_update hud       Only run the named benchmarks
+    python benchmark.py --output results.json  Also write the results to a file
+    python benchmark.py --update-thresholds    Write new thresholds from this run's results
+"""
+import os
+import sys
+import gc
+import json
+import time
+import random
+import argparse
+import tracemalloc
+
+# Must be set before pygame is initialised
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+# pygame prints a banner to stdout on import, which would come before the JSON results
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import pygame
+
+import replay
+import simulation
+import sprites
+import trashtosser
+
+THRESHOLDS_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "benchmark_thresholds.json")
+# Metrics thresholds are written for. The 99th percentile is only reported, as the scheduler alone stalls about one
+# call in a hundred for a few milliseconds on a busy machine, which would decide it
+METRICS = ("mean_us", "p95_us")
+REPEATS = 5 # Runs each benchmark's calls are split into, the median of each metric over them is reported
+BENCHMARKS = {}
+
+
+def benchmark(iterations):
+    """Registers a benchmark. The decorated function sets up and returns the function to time"""
+    def register(setup):
+        BENCHMARKS[setup.__name__] = (setup, iterations)
+        return setup
+    return register
+
+
+def percentile(samples, fraction):
+    """Nearest rank percentile of a sorted list"""
+    return samples[min(len(samples)-1, int(fraction * len(samples)))]
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    return values[middle] if len(values) % 2 else (values[middle-1] + values[middle]) / 2
+
+
+def time_calls(function, iterations):
+    """:return samples: list[int]: Sorted nanoseconds taken by each of iterations calls of function"""
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter_ns()
+        function()
+        samples.append(time.perf_counter_ns() - start)
+    samples.sort()
+    return samples
+
+
+def measure(function, iterations, repeats=REPEATS):
+    """
+    Times each call of function over several runs and measures the memory allocated across all of them
+
+    :return result: dict:
+    Median over the runs of the mean, 95th and 99th percentile time per call, and the memory allocated
+    """
+    # Warm up caches so the first calls don't skew the results
+    for _ in range(min(iterations // 10, 100)):
+        function()
+
+    # A collection landing in a call would be timed as part of it, so the collector only runs between runs
+    repeats = max(1, min(repeats, iterations))
+    enabled = gc.isenabled()
+    runs = []
+    for run in range(repeats):
+        gc.collect()
+        gc.disable()
+        try:
+            # The calls are shared out between the runs so the total stays at iterations
+            runs.append(time_calls(function, iterations * (run+1) // repeats - iterations * run // repeats))
+        finally:
+            if enabled:
+                gc.enable()
+
+    # Memory is measured in a separate pass as tracing allocations slows everything down
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    blocks = sys.getallocatedblocks()
+    for _ in range(iterations):
+        function()
+    after, peak = tracemalloc.get_traced_memory()
+    retained_blocks = sys.getallocatedblocks() - blocks
+    tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "repeats": repeats,
+        "mean_us": median(sum(samples) / len(samples) for samples in runs) / 1000,
+        "p95_us": median(percentile(samples, 0.95) for samples in runs) / 1000,
+        "p99_us": median(percentile(samples, 0.99) for samples in runs) / 1000,
+        "peak_alloc_bytes": peak - before,
+        "retained_bytes": after - before,
+        "retained_blocks": retained_blocks,
+    }
+
+
+def flying_trash(sim):
+    """Launches the simulation's trash at a fixed angle so benchmarks time it in the air"""
+    sim.trash.reset(random.Random(0))
+    sim.trash.aim(60, 1.5)
+    sim.trash.launch()
+    return sim.trash
+
+
+def make_game():
+    game = trashtosser.Game(0)
+    game.sync_sprites()
+    return game
+
+
+@benchmark(20000)
+def trash_update():
+    """simulation.Trash.update for a piece of trash in flight, relaunched whenever it lands"""
+    sim = simulation.Simulation(0)
+    trash = flying_trash(sim)
+
+    def run():
+        hit, _ = trash.update(1, 0, sim.index)
+        if hit is not None or not trash.moving:
+            flying_trash(sim)
+    return run
+
+
+@benchmark(5000)
+def trash_update_pixel():
+    """simulation.Trash.update with pixel collisions, relaunched whenever it lands"""
+    sim = simulation.Simulation(0, shapes=sprites.collision_shapes())
+    trash = flying_trash(sim)
+
+    def run():
+        hit, _ = trash.update(1, 0, sim.index)
+        if hit is not None or not trash.moving:
+            flying_trash(sim)
+    return run
+
+
+@benchmark(20000)
+def sprite_update():
+    """TrashObject.update copying the simulation state onto the sprite"""
+    game = make_game()
+    return game.trash.update
+
+
+@benchmark(5000)
+def draw_unrotated():
+    """GameObject.draw for a sprite with no rotation"""
+    game = make_game()
+    obstacle = game.obstacles[0]
+    return obstacle.draw
+
+
+@benchmark(5000)
+def draw_rotated():
+    """GameObject.draw for a spinning sprite, changing angle by a degree each call"""
+    game = make_game()
+    sprite = trashtosser.GameObject(game, 100, 100, game.trash.image, 1)
+
+    def run():
+        sprite.angle = sprite.angle % 360 + 1
+        sprite.draw()
+    return run
+
+
+@benchmark(5000)
+def trajectory_draw():
+    """TrashObject.draw while aiming, with the current and previous trajectories drawn"""
+    game = make_game()
+    game.sim.trash.old_trajectory = game.sim.trash.trajectory()
+    return game.trash.draw
+
+
+@benchmark(5000)
+def trajectory_draw_long():
+    """TrashObject.draw while aiming with a 300 orb trajectory preview"""
+    game = trashtosser.Game(0, trajectory_balls=300, trajectory_spacing=0.25)
+    game.sync_sprites()
+    game.sim.trash.old_trajectory = game.sim.trash.trajectory()
+    return game.trash.draw
+
+
+@benchmark(5000)
+def hud():
+    """Rendering and drawing the HUD text"""
+    game = make_game()
+
+    def run():
+        for text, rect in game.hud().values():
+            game.surface.blit(text, rect)
+    return run
+
+
+@benchmark(5000)
+def gen_bins():
+    """simulation.gen_bins for the default three bin layout"""
+    rng = random.Random(0)
+    return lambda: simulation.gen_bins(rng)
+
+
+def barrage_game(count):
+    """A game with count pieces of trash in flight, thrown again whenever most of them have landed"""
+    game = trashtosser.Game(0, barrage=count)
+    game.sync_sprites()
+
+    def refill():
+        if len(game.sim.barrage) < count // 4:
+            game.sim.trash.aim(45, 1.5)
+            game.sim.step(simulation.BARRAGE, 0)
+    refill()
+    return game, refill
+
+
+@benchmark(2000)
+def barrage_update():
+    """swarm.TrashStore.update for a barrage of 1000 pieces of trash"""
+    game, refill = barrage_game(1000)
+
+    def run():
+        game.sim.barrage.update(1, game.sim.bins)
+        refill()
+    return run
+
+
+@benchmark(1000)
+def barrage_draw():
+    """Barrage.draw for a barrage of 1000 pieces of trash"""
+    game, refill = barrage_game(1000)
+
+    def run():
+        game.sim.barrage.update(1, game.sim.bins)
+        refill()
+        game.barrage.draw()
+    return run
+
+
+@benchmark(2000)
+def frame():
+    """A full frame of the game loop playing back a scripted session"""
+    # Aim up and to the left for a while then throw, over and over again
+    script = replay.Replay(0)
+    for i in range(10000):
+        script.record(simulation.LAUNCH | simulation.RESTART if i % 90 == 89 else simulation.UP | simulation.LEFT, 1)
+
+    game = trashtosser.Game(playback=script)
+    game.handle_events = lambda events: 0
+    # Exactly one physics tick per frame
+    return lambda: game.run_frame(1 / simulation.FRAMECAP)
+
+
+def check(results, thresholds):
+    """Returns a list of every metric that went over its threshold"""
+    failures = []
+    for name, limits in thresholds.items():
+        if name not in results:
+            continue
+        for metric, limit in limits.items():
+            if results[name][metric] > limit:
+                failures.append(f"{name} {metric} {results[name][metric]:.1f} > {limit:.1f}")
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Trash Tosser frame time benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run, all of them if none are given")
+    parser.add_argument("--output", metavar="PATH", help="also write the results to this file")
+    parser.add_argument("--thresholds", metavar="PATH", default=THRESHOLDS_PATH, help="file of limits to check against")
+    parser.add_argument("--update-thresholds", action="store_true", help="write this run's results as the new thresholds")
+    parser.add_argument("--margin", type=float, default=2, help="multiplier on the results when updating thresholds")
+    parser.add_argument("--scale", type=float, default=1, help="multiplier on the number of iterations")
+    parser.add_argument("--repeats", type=int, default=REPEATS, help="runs the iterations are split into")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(unknown)}")
+
+    results = {}
+    for name in args.names or BENCHMARKS:
+        setup, iterations = BENCHMARKS[name]
+        results[name] = measure(setup(), max(1, int(iterations * args.scale)), args.repeats)
+    pygame.quit()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output)
+
+    if args.update_thresholds:
+        thresholds = {name: {metric: round(result[metric] * args.margin, 1) for metric in METRICS}
+                      for name, result in results.items()}
+        with open(args.thresholds, "w") as file:
+            json.dump(thresholds, file, indent=2)
+        return 0
+
+    if not os.path.exists(args.thresholds):
+        return 0
+    with open(args.thresholds) as file:
+        failures = check(results, json.load(file))
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
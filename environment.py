@@ -0,0 +1,338 @@
+"""
+Training environments for Trash Tosser
+
+Environment wraps a headless simulation.Simulation with the reset/step interface used by Gym style reinforcement
+learning libraries, without depending on any of them. Nothing is drawn and there is no window, so an environment steps
+as fast as the simulation does.
+VectorEnvironment steps many independent environments in lockstep across worker processes. The actions, observations,
+rewards and flags of every environment live in one block of shared memory, so a step only sends a short message to
+each worker instead of pickling arrays back and forth:
+    envs = VectorEnvironment(64, processes=8)
+    observations, infos = envs.reset(seed=0)
+    observations, rewards, terminated, truncated, infos = envs.step(actions)
+
+Observations are float32 vectors of the trash's position, velocity and type, whether it is still being aimed, the
+lives left and then the left edge and type of every bin from left to right.
+Actions index into ACTIONS, the input bitmask held for the step. Rewards are +1 for every point scored and -1 for
+every life lost.
+"""
+import sys
+import random
+import argparse
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import simulation
+from simulation import LEFT, RIGHT, UP, DOWN, SHIFT, LAUNCH, GAME_OVER
+
+# Inputs each action holds down, SHIFT aims in smaller steps
+ACTIONS = [
+    0,
+    LEFT, RIGHT, UP, DOWN,
+    LEFT | SHIFT, RIGHT | SHIFT, UP | SHIFT, DOWN | SHIFT,
+    LAUNCH,
+]
+
+TRASH_FEATURES = 7 # x, y, vx, vy, type, paused, lives
+BIN_FEATURES = 2 # x, type
+
+
+def observation_size(bin_count=3):
+    return TRASH_FEATURES + BIN_FEATURES * bin_count
+
+
+class Environment:
+    """
+    A single game of Trash Tosser with a Gym style interface
+
+    Attributes:
+        sim: simulation.Simulation
+            The game being played, replaced on every reset
+
+        frame_skip: int
+            Simulation frames each action is held for. LAUNCH only applies to the first of them
+
+        max_steps: int
+            Steps after which an episode is truncated, None to only end on a game over
+
+        steps: int
+            Steps taken since the last reset
+
+        observation_size: int, action_count: int
+            Length of the observation vectors and number of actions
+
+        kwargs: dict
+            Extra settings every Simulation is created with
+
+    Methods:
+        reset(seed: int = None) -> (array, dict)
+            Starts a new game and returns its first observation and info
+
+        step(action: int) -> (array, float, bool, bool, dict)
+            Holds an action for frame_skip frames and returns the observation, reward, whether the game is over,
+            whether the episode was cut short by max_steps, and info
+
+        observe(out: array = None) -> array
+            Writes the current observation into out, or a new array
+    """
+    def __init__(self, frame_skip=4, max_steps=None, **kwargs):
+        self.frame_skip = frame_skip
+        self.max_steps = max_steps
+        self.kwargs = kwargs
+        self.rng = random.Random()
+
+        self.sim = None
+        self.steps = 0
+        self.observation_size = observation_size(len(kwargs.get("bin_types", (0, 1, 2))))
+        self.action_count = len(ACTIONS)
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.rng.seed(seed)
+        self.sim = simulation.Simulation(self.rng.randrange(2**32), **self.kwargs)
+        self.steps = 0
+        return self.observe(), self.info()
+
+    def step(self, action):
+        sim = self.sim
+        score, lives = sim.score, sim.lives
+
+        inputs = ACTIONS[action]
+        for frame in range(self.frame_skip):
+            sim.step(inputs if frame == 0 else inputs & ~LAUNCH)
+            if sim.state == GAME_OVER:
+                break
+        self.steps += 1
+
+        reward = (sim.score - score) - (lives - sim.lives)
+        terminated = sim.state == GAME_OVER
+        truncated = not terminated and self.max_steps is not None and self.steps >= self.max_steps
+        return self.observe(), float(reward), terminated, truncated, self.info()
+
+    def observe(self, out=None):
+        if out is None:
+            out = np.empty(self.observation_size, dtype=np.float32)
+        trash = self.sim.trash
+        out[:TRASH_FEATURES] = (trash.x, trash.y, trash.vx, trash.vy, trash.type, trash.paused, self.sim.lives)
+        for i, bin in enumerate(self.sim.bins):
+            start = TRASH_FEATURES + i*BIN_FEATURES
+            out[start:start + BIN_FEATURES] = (bin.x, bin.type)
+        return out
+
+    def info(self):
+        return {"score": self.sim.score, "lives": self.sim.lives, "seed": self.sim.seed}
+
+
+def worker(name, count, start, end, kwargs, connection):
+    """
+    Worker process entry point, steps environments start to end of the vector whenever the parent asks
+
+    Reads the actions from and writes the results into the shared memory block, only short commands go through
+    the connection
+    """
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        buffers = SharedBuffers(memory.buf, count, observation_size(len(kwargs.get("bin_types", (0, 1, 2)))))
+        envs = [Environment(**kwargs) for _ in range(start, end)]
+
+        while True:
+            command, argument = connection.recv()
+            if command == "close":
+                break
+            elif command == "reset":
+                for i, env in enumerate(envs, start):
+                    env.reset(None if argument is None else argument + i)
+                    env.observe(buffers.observations[i])
+            elif command == "step":
+                step(envs, start, buffers)
+            connection.send(None)
+    finally:
+        # The views into the block have to go before it can be closed
+        del buffers
+        memory.close()
+
+
+def step(envs, start, buffers):
+    """Steps environments start onwards with their actions from the buffers, resetting the ones that ended"""
+    for i, env in enumerate(envs, start):
+        _, reward, terminated, truncated, _ = env.step(int(buffers.actions[i]))
+        buffers.rewards[i] = reward
+        buffers.terminated[i] = terminated
+        buffers.truncated[i] = truncated
+        buffers.scores[i] = env.sim.score
+
+        # Finished environments start again straight away, the observation returned is the new game's first one
+        if terminated or truncated:
+            env.reset()
+        env.observe(buffers.observations[i])
+
+
+class SharedBuffers:
+    """
+    NumPy views of the arrays shared between the parent and the workers, laid out one after another in a buffer
+
+    Attributes:
+        actions: array, observations: array, rewards: array, terminated: array, truncated: array, scores: array
+            One element or row per environment
+
+        size: int
+            Bytes needed for every array
+    """
+    def __init__(self, buffer, count, size):
+        layout = [
+            ("actions", np.int32, (count,)),
+            ("observations", np.float32, (count, size)),
+            ("rewards", np.float32, (count,)),
+            ("terminated", np.bool_, (count,)),
+            ("truncated", np.bool_, (count,)),
+            ("scores", np.int32, (count,)),
+        ]
+        offset = 0
+        for name, dtype, shape in layout:
+            # Every array starts on an 8 byte boundary
+            offset = (offset + 7) // 8 * 8
+            array = None
+            if buffer is not None:
+                array = np.ndarray(shape, dtype=dtype, buffer=buffer, offset=offset)
+            setattr(self, name, array)
+            offset += int(np.prod(shape)) * np.dtype(dtype).itemsize
+        self.size = offset
+
+
+class VectorEnvironment:
+    """
+    Many independent Environments stepped in lockstep across worker processes
+
+    Environments that end are reset straight away, so the observation returned for them is the first one of their
+    next game and terminated or truncated tells the episode ended
+
+    Attributes:
+        count: int
+            Number of environments
+
+        processes: int
+            Number of worker processes, 0 steps every environment in this process
+
+        observations: array, rewards: array, terminated: array, truncated: array
+            Results of the last step for every environment, stored in shared memory
+
+    Methods:
+        reset(seed: int = None) -> (array, dict)
+            Resets every environment, environment i is seeded with seed + i
+
+        step(actions: array) -> (array, array, array, array, dict)
+            Steps every environment with its action and returns the observations, rewards, terminated and truncated
+            flags and an info dict holding the score of every environment. The arrays are copies unless the vector
+            was made with copy=False, in which case they are overwritten by the next step
+
+        close()
+            Stops the workers and frees the shared memory
+    """
+    def __init__(self, count, processes=None, copy=True, **kwargs):
+        self.count = count
+        self.processes = min(processes if processes is not None else multiprocessing.cpu_count(), count)
+        self.copy = copy
+        self.size = observation_size(len(kwargs.get("bin_types", (0, 1, 2))))
+
+        self.memory = shared_memory.SharedMemory(create=True, size=SharedBuffers(None, count, self.size).size)
+        self.buffers = SharedBuffers(self.memory.buf, count, self.size)
+        self.observations = self.buffers.observations
+        self.rewards = self.buffers.rewards
+        self.terminated = self.buffers.terminated
+        self.truncated = self.buffers.truncated
+
+        self.envs = []
+        self.workers = []
+        if self.processes == 0:
+            self.envs = [Environment(**kwargs) for _ in range(count)]
+            return
+
+        # Workers are spawned like the autoplayer's so they don't inherit anything from a running game
+        context = multiprocessing.get_context("spawn")
+        bounds = np.linspace(0, count, self.processes + 1).astype(int)
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            parent, child = context.Pipe()
+            process = context.Process(target=worker, args=(self.memory.name, count, start, end, kwargs, child),
+                                      daemon=True)
+            process.start()
+            self.workers.append((process, parent))
+
+    def broadcast(self, command, argument=None):
+        """Sends a command to every worker and waits for all of them to finish it"""
+        for _, connection in self.workers:
+            connection.send((command, argument))
+        for _, connection in self.workers:
+            connection.recv()
+
+    def results(self, *arrays):
+        return tuple(array.copy() for array in arrays) if self.copy else arrays
+
+    def reset(self, seed=None):
+        if self.workers:
+            self.broadcast("reset", seed)
+        else:
+            for i, env in enumerate(self.envs):
+                env.reset(None if seed is None else seed + i)
+                env.observe(self.observations[i])
+        observations, = self.results(self.observations)
+        return observations, {}
+
+    def step(self, actions):
+        self.buffers.actions[:] = actions
+        if self.workers:
+            self.broadcast("step")
+        else:
+            step(self.envs, 0, self.buffers)
+        info = {"score": self.buffers.scores.copy()}
+        return (*self.results(self.observations, self.rewards, self.terminated, self.truncated), info)
+
+    def close(self):
+        if self.memory is None:
+            return
+        for process, connection in self.workers:
+            connection.send(("close", None))
+            process.join()
+        self.workers = []
+
+        # Every view into the block has to go before it can be closed
+        self.buffers = self.observations = self.rewards = self.terminated = self.truncated = None
+        self.memory.close()
+        self.memory.unlink()
+        self.memory = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure how fast Trash Tosser environments step with random actions")
+    parser.add_argument("--envs", type=int, default=64, help="number of environments")
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to one per core, 0 for none")
+    parser.add_argument("--steps", type=int, default=1000, help="steps of every environment to time")
+    parser.add_argument("--frame-skip", type=int, default=4, help="simulation frames per step")
+    args = parser.parse_args(argv)
+
+    rng = np.random.default_rng(0)
+    with VectorEnvironment(args.envs, args.processes, frame_skip=args.frame_skip) as envs:
+        envs.reset(seed=0)
+        started = time.perf_counter()
+        episodes = 0
+        for _ in range(args.steps):
+            _, _, terminated, truncated, _ = envs.step(rng.integers(0, len(ACTIONS), args.envs))
+            episodes += int(np.count_nonzero(terminated | truncated))
+        seconds = time.perf_counter() - started
+
+    steps = args.steps * args.envs
+    print(f"{steps} steps ({steps * args.frame_skip} frames) in {seconds:.2f}s, {steps / seconds:.0f} steps/s, "
+          f"{episodes} episodes finished")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,276 @@
+"""
+Prebuilt catalog of bin layouts for Trash Tosser
+
+Random layouts from simulation.gen_bins can be trivially easy or impossible to score in with the power range and the
+aim limits, and solving a layout is too slow to do on every reset. Instead every layout on a grid of bin positions is
+solved ahead of time with batch.solve_throws and written to a binary index:
+    python layouts.py --step 16 --processes 32
+Every throw is made with a single trash type and a layout that is easy for one type can be hard for another, so the
+layouts are ranked separately for each trash type. The game memory maps the index and picks a layout from a
+difficulty tier for the trash about to be thrown by reading a single fixed size record, so picking a layout takes the
+same time no matter how big the catalog is.
+
+File layout: header, then for each trash type the position of the first layout of each tier in its order followed by
+the number of layouts, then for each trash type the index of every layout sorted from easiest to hardest for it, then
+one record per layout.
+Record: left edge of each bin, type of each bin, difficulty for each trash type and then for each trash type a bitmap
+of the (angle, power) grid with a bit set for every throw that scores, one row of powers per angle
+"""
+import os
+import sys
+import mmap
+import zlib
+import struct
+import argparse
+import itertools
+import multiprocessing
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import batch
+import simulation
+from simulation import SIZE_X, BASE_BIN_SIZE, MIN_POWER, MAX_POWER, SCORED
+
+CATALOG_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "res", "layouts.idx")
+CATALOG_MAGIC = b"TTLC"
+CATALOG_VERSION = 2
+# Header: magic, version, checksum of everything after the header, number of layouts, bins per layout, trash types,
+#         angle steps, power steps, number of tiers
+CATALOG_HEADER = struct.Struct("<4sHIIBBHHB")
+
+TRASH_TYPES = 3
+DIFFICULTY_SCALE = 65535 # Difficulties are stored as 16 bit fractions
+
+# A layout read from the catalog, difficulties has the fraction of throws that don't score for each trash type
+Layout = namedtuple("Layout", ["index", "positions", "types", "difficulties"])
+
+_catalog = None # The default catalog once it has been opened, False if there isn't one
+
+
+def enumerate_layouts(types=(0, 1, 2), left=400, right=SIZE_X-BASE_BIN_SIZE*2, step=16):
+    """
+    Yields (positions, types) for every layout simulation.gen_bins can make with the bins moved in steps of step
+    pixels, for every order of the bin types
+    """
+    slack = right - left - (len(types)-1)*BASE_BIN_SIZE
+    offsets = range(0, slack + 1, step)
+    orders = sorted(set(itertools.permutations(types)))
+
+    # The same packing as gen_bins, sorted offsets into the free space with each bin pushed right by the ones before it
+    for chosen in itertools.combinations_with_replacement(offsets, len(types)):
+        positions = tuple(left + offset + i*BASE_BIN_SIZE for i, offset in enumerate(chosen))
+        for order in orders:
+            yield positions, order
+
+
+def solve_layout(layout, angle_steps, power_steps):
+    """
+    Worker process entry point, throws every trash type across the whole (angle, power) grid at a layout
+
+    :return difficulties, regions: (array, array):
+    Fraction of the grid that doesn't score for each trash type and a (types, angles, powers) array of the throws
+    that score
+    """
+    positions, types = layout
+    bins = [simulation.Bin(x, type) for x, type in zip(positions, types)]
+    angles = np.linspace(-90, 90, angle_steps)
+    powers = np.linspace(MIN_POWER, MAX_POWER, power_steps)
+
+    results, _ = batch.solve_throws(bins, np.arange(TRASH_TYPES)[:, None, None], angles[None, :, None],
+                                    powers[None, None, :])
+    regions = results == SCORED
+    return 1 - regions.mean(axis=(1, 2)), regions
+
+
+def build(path=CATALOG_PATH, step=16, angle_steps=61, power_steps=26, tiers=4, processes=None):
+    """
+    Solves every layout and writes the catalog, leaving out the layouts some trash type can't score in at all
+
+    :return count: int:
+    Number of layouts written
+    """
+    layouts = list(enumerate_layouts(step=step))
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1:
+        solved = [solve_layout(layout, angle_steps, power_steps) for layout in layouts]
+    else:
+        # Spawned like the autoplayer's workers so nothing of the parent process is inherited
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            solved = list(pool.map(solve_layout, layouts, itertools.repeat(angle_steps),
+                                   itertools.repeat(power_steps), chunksize=16))
+
+    # Impossible layouts are dropped
+    entries = [(layout, difficulties, regions)
+               for layout, (difficulties, regions) in zip(layouts, solved) if regions.any(axis=(1, 2)).all()]
+
+    # Tiers have the same number of layouts each, so tier 0 is the easiest quarter of the catalog by default
+    count = len(entries)
+    starts = [round(tier * count / tiers) for tier in range(tiers + 1)]
+    bin_count = len(layouts[0][0])
+
+    body = bytearray()
+    for _ in range(TRASH_TYPES):
+        body += struct.pack(f"<{tiers+1}I", *starts)
+    # Each trash type has its own order, from the layout easiest to score in with it to the hardest
+    for type in range(TRASH_TYPES):
+        order = sorted(range(count), key=lambda index: entries[index][1][type])
+        body += struct.pack(f"<{count}I", *order)
+    for (positions, types), difficulties, regions in entries:
+        body += struct.pack(f"<{bin_count}H{bin_count}B", *positions, *types)
+        body += struct.pack(f"<{TRASH_TYPES}H", *(round(d * DIFFICULTY_SCALE) for d in difficulties))
+        for region in regions:
+            body += np.packbits(region.ravel()).tobytes()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(CATALOG_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, zlib.crc32(body), count, bin_count,
+                                       TRASH_TYPES, angle_steps, power_steps, tiers))
+        file.write(body)
+    return count
+
+
+class Catalog:
+    """
+    A memory mapped catalog of solved layouts
+
+    Only the header and the tier table are read when opening, records are read straight from the mapped file when
+    a layout is picked so the catalog is never loaded as a whole
+
+    Attributes:
+        checksum: int
+            CRC32 of the catalog's contents, recorded in replays so they are played back with the same layouts
+
+        count: int, tiers: int
+            Number of layouts and difficulty tiers
+
+        bin_count: int, angle_steps: int, power_steps: int
+            Bins in each layout and the size of the (angle, power) grid they were solved on
+
+        starts: list[tuple[int]]
+            For each trash type the position of the first layout of each tier in its order, followed by count
+
+    Methods:
+        layout(index: int) -> Layout
+            Reads a layout from the catalog
+
+        bins(index: int) -> list[simulation.Bin]
+            New bins for a layout
+
+        region(index: int, type: int) -> array
+            (angles, powers) boolean array of the throws that score with the given trash type
+
+        ranked(type: int, position: int) -> int
+            Index of the layout at a position in the order from easiest to hardest for a trash type
+
+        sample(rng: random.Random, tier: int, type: int) -> list[simulation.Bin]
+            Bins of a random layout from a difficulty tier for a trash type, 0 being the easiest
+
+        close()
+            Unmaps the file
+    """
+    def __init__(self, path=CATALOG_PATH):
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, checksum, count, bin_count, trash_types, angle_steps, power_steps, tiers = \
+            CATALOG_HEADER.unpack_from(self.data, 0)
+        if magic != CATALOG_MAGIC or version != CATALOG_VERSION:
+            self.data.close()
+            raise ValueError(f"{path} is not a version {CATALOG_VERSION} layout catalog")
+
+        self.checksum = checksum
+        self.count = count
+        self.bin_count = bin_count
+        self.trash_types = trash_types
+        self.angle_steps = angle_steps
+        self.power_steps = power_steps
+        self.tiers = tiers
+        self.starts = [struct.unpack_from(f"<{tiers+1}I", self.data, CATALOG_HEADER.size + 4 * (tiers+1) * type)
+                       for type in range(trash_types)]
+
+        # The orders of each trash type come after the tier tables and the records after them
+        self.orders_offset = CATALOG_HEADER.size + 4 * (tiers + 1) * trash_types
+
+        # Every record is the same size so any layout can be found from its index
+        self.record = struct.Struct(f"<{bin_count}H{bin_count}B{trash_types}H")
+        self.region_size = (angle_steps * power_steps + 7) // 8
+        self.record_size = self.record.size + self.region_size * trash_types
+        self.offset = self.orders_offset + 4 * count * trash_types
+
+    def __len__(self):
+        return self.count
+
+    def layout(self, index):
+        values = self.record.unpack_from(self.data, self.offset + index * self.record_size)
+        positions = values[:self.bin_count]
+        types = values[self.bin_count:self.bin_count*2]
+        difficulties = tuple(value / DIFFICULTY_SCALE for value in values[self.bin_count*2:])
+        return Layout(index, positions, types, difficulties)
+
+    def bins(self, index):
+        layout = self.layout(index)
+        return [simulation.Bin(x, type) for x, type in zip(layout.positions, layout.types)]
+
+    def region(self, index, type):
+        start = self.offset + index * self.record_size + self.record.size + type * self.region_size
+        bits = np.frombuffer(self.data, dtype=np.uint8, count=self.region_size, offset=start)
+        return np.unpackbits(bits)[:self.angle_steps * self.power_steps].reshape(self.angle_steps, self.power_steps) == 1
+
+    def ranked(self, type, position):
+        index, = struct.unpack_from("<I", self.data, self.orders_offset + 4 * (type * self.count + position))
+        return index
+
+    def sample(self, rng, tier, type):
+        if not 0 <= tier < self.tiers:
+            raise ValueError(f"tier must be between 0 and {self.tiers - 1}")
+        start, end = self.starts[type][tier], self.starts[type][tier + 1]
+        if start == end:
+            raise ValueError(f"tier {tier} has no layouts")
+        return self.bins(self.ranked(type, rng.randrange(start, end)))
+
+    def close(self):
+        self.data.close()
+
+
+def load(path=CATALOG_PATH):
+    """Returns the catalog at path, opening the default one only once, or None if it hasn't been built"""
+    global _catalog
+    if path != CATALOG_PATH:
+        return Catalog(path) if os.path.exists(path) else None
+
+    if _catalog is None:
+        _catalog = Catalog(path) if os.path.exists(path) else False
+    return _catalog or None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the catalog of solved Trash Tosser layouts")
+    parser.add_argument("--output", default=CATALOG_PATH, help="path to write the catalog to")
+    parser.add_argument("--step", type=int, default=16, help="pixels between the bin positions tried")
+    parser.add_argument("--angle-steps", type=int, default=61, help="angles in the grid each layout is solved on")
+    parser.add_argument("--power-steps", type=int, default=26, help="powers in the grid each layout is solved on")
+    parser.add_argument("--tiers", type=int, default=4, help="number of difficulty tiers")
+    parser.add_argument("--processes", type=int, help="worker processes, defaults to one per core")
+    args = parser.parse_args(argv)
+
+    count = build(args.output, args.step, args.angle_steps, args.power_steps, args.tiers, args.processes)
+    catalog = Catalog(args.output)
+    for type in range(catalog.trash_types):
+        for tier in range(catalog.tiers):
+            start, end = catalog.starts[type][tier], catalog.starts[type][tier + 1]
+            if start == end:
+                continue
+            easiest = catalog.layout(catalog.ranked(type, start))
+            hardest = catalog.layout(catalog.ranked(type, end - 1))
+            print(f"trash {type} tier {tier}: {end - start} layouts, difficulty {easiest.difficulties[type]:.3f} "
+                  f"to {hardest.difficulties[type]:.3f}")
+    print(f"{count} layouts written to {args.output}")
+    catalog.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+Per-phase frame timing for Trash Tosser
+
+Each phase of a frame (events, simulation, HUD, drawing, display update, waiting for the framerate cap) is wrapped in
+a named scope. The last few seconds of timings are kept for the in-game overlay, and every frame can also be kept so
+it can be written to a CSV or JSON file when the game closes.
+When profiling is off, scope() hands back a shared do-nothing context manager so the game loop pays almost nothing
+"""
+import csv
+import json
+import time
+from collections import deque
+from contextlib import nullcontext
+
+NULL_SCOPE = nullcontext()
+
+
+class Scope:
+    """Context manager adding the time spent inside it to a phase of the current frame"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        frame = self.profiler.frame
+        frame[self.name] = frame.get(self.name, 0) + time.perf_counter() - self.start
+
+
+class Profiler:
+    """
+    Collects how long each phase of each frame took
+
+    Attributes:
+        enabled: bool
+            Whether timings are being collected at all
+
+        overlay: bool
+            Whether the overlay with FPS and per-phase times is being shown
+
+        history: dict[str, deque]
+            Rolling window of the last few hundred frame times of each phase in seconds, plus "frame" for the whole frame
+
+        frames: list[dict] or None
+            Every frame's phase times, kept only when the timings will be exported
+
+        frame: dict
+            Phase times of the frame in progress
+
+    Methods:
+        scope(name: str)
+            Context manager timing a phase of the current frame
+
+        begin_frame(), end_frame()
+            Mark the start and end of a frame
+
+        toggle_overlay()
+            Shows or hides the overlay, turning timing on if it was off
+
+        stats(name: str) -> (float, float, float)
+            Mean, 95th percentile and max of a phase in milliseconds over the rolling window
+
+        histogram(name: str, buckets: int, limit: float) -> list[int]
+            Counts of the rolling window's times for a phase in equal width buckets from 0 to limit milliseconds
+
+        lines() -> list[str]
+            Text for the overlay
+
+        last() -> dict
+            Phase times of the last finished frame in milliseconds, empty while timing is off
+
+        export(path: str)
+            Writes every kept frame to a .csv or .json file
+    """
+    def __init__(self, enabled=False, keep_frames=False, window=240):
+        self.enabled = enabled or keep_frames
+        self.overlay = False
+
+        self.window = window
+        self.history = {}
+        self.frames = [] if keep_frames else None
+
+        self.frame = {}
+        self.frame_start = None # Start of the frame in progress, None if it began before timing was turned on
+        self.phases = [] # Phase names in the order they were first seen
+
+    def scope(self, name):
+        if not self.enabled:
+            return NULL_SCOPE
+        return Scope(self, name)
+
+    def begin_frame(self):
+        if self.enabled:
+            self.frame = {}
+            self.frame_start = time.perf_counter()
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        self.frame["frame"] = time.perf_counter() - self.frame_start
+        self.frame_start = None
+
+        for name, seconds in self.frame.items():
+            if name not in self.history:
+                self.history[name] = deque(maxlen=self.window)
+                if name != "frame":
+                    self.phases.append(name)
+            self.history[name].append(seconds)
+
+        if self.frames is not None:
+            self.frames.append(self.frame)
+
+    def toggle_overlay(self):
+        self.overlay = not self.overlay
+        if self.overlay:
+            # Timing starts with the next frame, the one in progress has no start time
+            if not self.enabled:
+                self.frame = {}
+                self.frame_start = None
+            self.enabled = True
+        # Stop timing again when the overlay is hidden unless every frame is being kept for exporting
+        elif self.frames is None:
+            self.enabled = False
+            self.history.clear()
+
+    def stats(self, name):
+        samples = sorted(self.history.get(name, ()))
+        if not samples:
+            return 0, 0, 0
+        return (
+            sum(samples) / len(samples) * 1000,
+            samples[min(len(samples)-1, int(0.95 * len(samples)))] * 1000,
+            samples[-1] * 1000
+        )
+
+    def histogram(self, name, buckets=10, limit=20):
+        counts = [0] * buckets
+        for seconds in self.history.get(name, ()):
+            counts[min(buckets-1, int(seconds * 1000 / limit * buckets))] += 1
+        return counts
+
+    def last(self):
+        return {name: samples[-1] * 1000 for name, samples in self.history.items() if samples}
+
+    def lines(self):
+        mean, _, _ = self.stats("frame")
+        lines = [f"FPS {1000/mean:.0f}" if mean else "FPS -"]
+        for name in ["frame"] + self.phases:
+            mean, p95, worst = self.stats(name)
+            lines.append(f"{name:<10} {mean:5.2f} {p95:5.2f} {worst:5.2f} ms")
+        return lines
+
+    def export(self, path):
+        if self.frames is None:
+            return
+        columns = ["frame"] + self.phases
+
+        if path.endswith(".json"):
+            with open(path, "w") as file:
+                json.dump({
+                    "phases": columns,
+                    "summary": {name: dict(zip(("mean_ms", "p95_ms", "max_ms"), self.stats(name))) for name in columns},
+                    "frames": [{name: frame.get(name, 0) * 1000 for name in columns} for frame in self.frames],
+                }, file, indent=1)
+        else:
+            with open(path, "w", newline="") as file:
+                writer = csv.writer(file)
+                writer.writerow(["index"] + [f"{name}_ms" for name in columns])
+                for index, frame in enumerate(self.frames):
+                    writer.writerow([index] + [f"{frame.get(name, 0) * 1000:.4f}" for name in columns])
@@ -0,0 +1,567 @@
+"""
+Rendering helpers for Trash Tosser
+
+Caches for anything that is expensive to create with pygame but is drawn over and over again between frames
+"""
+from collections import OrderedDict
+
+import pygame
+
+from collision import rotation_offset # Shared with the collision masks so they line up with the drawn sprites
+
+
+def _surface_bytes(surface):
+    """Bytes of pixel data held by a surface"""
+    return surface.get_pitch() * surface.get_height()
+
+
+def _evict(cache, nbytes, max_bytes, surface):
+    """
+    :return nbytes: int:
+    Throws away the least recently used entries of an OrderedDict cache until its nbytes of pixel data fit in
+    max_bytes again, returning how many bytes are left. surface gets the surface out of an entry
+    """
+    while nbytes > max_bytes:
+        _, old = cache.popitem(last=False)
+        nbytes -= _surface_bytes(surface(old))
+    return nbytes
+
+
+class TextCache:
+    """
+    Cache of fonts and rendered text surfaces
+
+    Fonts are loaded from disk once per size and kept forever as there are only ever a few sizes.
+    Rendered text is kept in a least recently used cache so HUD text that hasn't changed is not rendered again,
+    with the oldest surfaces thrown away once their pixel data goes over max_bytes
+
+    Attributes:
+        fonts: dict[int, pygame.font.Font]
+            Loaded fonts keyed by size
+
+        surfaces: OrderedDict
+            Rendered surfaces keyed by (text, size, color, antialias), most recently used last
+
+        max_bytes: int
+            Memory budget for the pixel data of the cached surfaces
+
+        bytes: int
+            Memory currently used by the cached surfaces
+
+        hits: int, misses: int
+            Counters of how many renders were served from the cache and how many had to be rendered
+
+    Methods:
+        font(size: int) -> pygame.font.Font
+            Returns the default font in the given size, loading it the first time
+
+        render(text: str, size: int, color: tuple, antialias: bool) -> pygame.Surface
+            Returns the rendered text, only rendering it if it isn't already cached
+
+        clear()
+            Empties the surface cache
+    """
+    def __init__(self, max_bytes=4*1024*1024):
+        self.fonts = {}
+        self.surfaces = OrderedDict()
+
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            font = pygame.font.Font(pygame.font.get_default_font(), size)
+            self.fonts[size] = font
+        return font
+
+    def render(self, text, size, color=(255,255,255), antialias=True):
+        key = (text, size, tuple(color), antialias)
+
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.hits += 1
+            self.surfaces.move_to_end(key)
+            return surface
+
+        self.misses += 1
+        surface = self.font(size).render(text, antialias, color)
+
+        # Surfaces bigger than the whole budget are returned without being cached
+        nbytes = _surface_bytes(surface)
+        if nbytes > self.max_bytes:
+            return surface
+
+        self.surfaces[key] = surface
+        self.bytes = _evict(self.surfaces, self.bytes + nbytes, self.max_bytes, lambda old: old)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+        self.bytes = 0
+
+
+class RotationCache:
+    """
+    Cache of rotated images and their draw offsets
+
+    Rotating an image with pygame.transform.rotate is slow and a spinning piece of trash only ever uses the same few
+    hundred angles, so each (image, angle) pair is rotated once and looked up afterwards.
+    Angles are rounded to the nearest multiple of step degrees, and the least recently used rotations are thrown away
+    once their pixel data goes over max_bytes.
+    Rotated images are run length encoded, so they must not be drawn on
+
+    Attributes:
+        step: float
+            Size of the angle buckets in degrees
+
+        max_bytes: int
+            Memory budget for the pixel data of the cached rotations
+
+        bytes: int
+            Memory currently used by the cached rotations
+
+        rotations: OrderedDict
+            (image, quantized angle) -> (rotated image, offset), most recently used last
+
+        hits: int, misses: int
+            Counters of how many rotations were served from the cache and how many had to be calculated
+
+    Methods:
+        get(image: pygame.Surface, angle: float) -> (pygame.Surface, tuple)
+            Returns the rotated image and the offset to add to the unrotated position when drawing it
+
+        warm(image: pygame.Surface)
+            Rotates the image to every angle bucket ahead of time, stopping if the cache fills up
+
+        clear()
+            Empties the cache
+    """
+    def __init__(self, step=1, max_bytes=64*1024*1024):
+        self.step = step
+        self.max_bytes = max_bytes
+        self.bytes = 0
+
+        self.rotations = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def quantize(self, angle):
+        return round(angle / self.step) * self.step % 360
+
+    def get(self, image, angle):
+        key = (image, self.quantize(angle))
+
+        rotation = self.rotations.get(key)
+        if rotation is not None:
+            self.hits += 1
+            self.rotations.move_to_end(key)
+            return rotation
+
+        self.misses += 1
+        return self.add(key)
+
+    def add(self, key):
+        image, angle = key
+        rotated = pygame.transform.rotate(image, angle)
+        # Cached rotations are never drawn on, so they can be run length encoded which skips over the transparent
+        # corners rotation adds and makes blitting them several times faster. Per pixel alpha is kept as is
+        rotated.set_alpha(255, pygame.RLEACCEL)
+        rotation = (rotated, rotation_offset(*image.get_size(), angle))
+
+        nbytes = _surface_bytes(rotated)
+        if nbytes > self.max_bytes:
+            return rotation
+
+        self.rotations[key] = rotation
+        self.bytes = _evict(self.rotations, self.bytes + nbytes, self.max_bytes, lambda old: old[0])
+        return rotation
+
+    def warm(self, image):
+        buckets = int(360 / self.step)
+        for i in range(buckets):
+            key = (image, self.quantize(i * self.step))
+            if key in self.rotations:
+                continue
+            self.add(key)
+            # Stop before the next rotation would start evicting the ones just added
+            if not self.rotations or self.bytes + self.bytes/len(self.rotations) > self.max_bytes:
+                break
+
+    def clear(self):
+        self.rotations.clear()
+        self.bytes = 0
+
+
+class DotCache:
+    """
+    Cache of pre-rendered antialiased circles for the trajectory orbs
+
+    pygame.draw.circle has to rasterise every orb every frame and doesn't antialias, so each (radius, color) pair is
+    drawn once at a larger size and smoothly scaled down, and the orbs of a trajectory are then drawn with a single
+    Surface.blits call. Radii are rounded to the nearest multiple of step pixels so there are only a few dozen of them
+
+    Attributes:
+        step: float
+            Size of the radius buckets in pixels
+
+        dots: dict
+            (quantized radius, color) -> (dot surface, offset from the centre to the top left corner)
+
+        sequences: dict
+            color -> (orbs, scale, blit sequence) of the last orbs drawn in each color, as a trajectory is usually
+            drawn unchanged for many frames in a row
+
+    Methods:
+        get(radius: float, color: tuple) -> (pygame.Surface, float)
+            Returns the dot surface and the offset to add to the centre when drawing it
+
+        blits(orbs: list[tuple], color: tuple, scale: float = 1) -> list[tuple]
+            Returns (surface, position) pairs drawing every (x, y, radius) orb scaled to the render resolution,
+            ready for Surface.blits. The pairs are reused while the same orbs list is drawn again in the same color
+
+        clear()
+            Empties the cache
+    """
+    SUPERSAMPLE = 4 # Dots are drawn this many times larger before being scaled down
+
+    def __init__(self, step=0.25):
+        self.step = step
+        self.dots = {}
+        self.sequences = {}
+
+    def get(self, radius, color):
+        key = (round(radius / self.step) * self.step, color)
+        dot = self.dots.get(key)
+        if dot is None:
+            dot = self.add(key)
+        return dot
+
+    def add(self, key):
+        radius, color = key
+        size = int(radius * 2) + 2 # One pixel of space on each side for the antialiased edge
+        large = pygame.Surface((size * self.SUPERSAMPLE, size * self.SUPERSAMPLE), pygame.SRCALPHA)
+        pygame.draw.circle(large, color, (size * self.SUPERSAMPLE / 2,) * 2, max(radius, 0) * self.SUPERSAMPLE)
+
+        surface = pygame.transform.smoothscale(large, (size, size))
+        # Dots are never drawn on so they can be run length encoded, like the cached rotations
+        surface.set_alpha(255, pygame.RLEACCEL)
+
+        dot = (surface, -size / 2)
+        self.dots[key] = dot
+        return dot
+
+    def blits(self, orbs, color, scale=1):
+        # Trash.trajectory returns the same list until the aim changes
+        last = self.sequences.get(color)
+        if last is not None and last[0] is orbs and last[1] == scale:
+            return last[2]
+
+        get = self.get
+        sequence = []
+        for x, y, radius in orbs:
+            surface, offset = get(radius * scale, color)
+            sequence.append((surface, (x*scale + offset, y*scale + offset)))
+        self.sequences[color] = (orbs, scale, sequence)
+        return sequence
+
+    def clear(self):
+        self.dots.clear()
+        self.sequences.clear()
+
+
+class AdaptiveResolution:
+    """
+    Draws frames at a lower resolution when they take too long, scaling them up to fill the window
+
+    Frames are drawn into an internal surface scale times the size of the window, which is stretched over the window
+    once the frame is finished. The time each frame takes is averaged, and when the average goes over the frame
+    budget the scale drops a step. Once the average shows there is enough headroom for the extra pixels of the next
+    step up it is raised again. After every change the scale is kept for a while so the average can settle.
+    At full scale the frame is drawn straight onto the window so there's nothing to stretch.
+    Everything keeps using the window's coordinates, positions and images are only multiplied by scale when drawing
+
+    Attributes:
+        display: pygame.Surface
+            The window surface frames are shown on
+
+        surface: pygame.Surface
+            Surface frames are drawn to at the current scale, the display itself at full scale
+
+        scales: list[float]
+            Scales that can be picked from, largest first
+
+        level: int
+            Index into scales of the current scale
+
+        scale: float
+            Size of the internal surface relative to the window
+
+        budget: float
+            Seconds a frame should take at most
+
+        average: float
+            Exponential moving average of how long frames took, in seconds
+
+        cooldown: int
+            Frames left before the scale can change again
+
+        images: dict
+            (image, scale) -> image resized for that scale
+
+    Methods:
+        measure(frame_time: float) -> bool
+            Adds a frame's time to the average and changes the scale if needed, returning whether it changed
+
+        image(image: pygame.Surface) -> pygame.Surface
+            Returns the image resized to the current scale
+
+        present()
+            Stretches the internal surface over the window, after which the display can be updated
+    """
+    SMOOTHING = 0.1 # Weight of the latest frame in the average
+    HEADROOM = 0.75 # Fraction of the budget a frame at the next scale up is expected to fit in before raising it
+    COOLDOWN = 30 # Frames to wait after a change before changing again
+
+    def __init__(self, display, budget, min_scale=0.5, step=0.125):
+        self.display = display
+        self.budget = budget
+
+        # Multiples of an eighth keep the internal surface a whole number of pixels for the default window
+        self.scales = [1.0]
+        while self.scales[-1] - step >= min_scale - 1e-9:
+            self.scales.append(round(self.scales[-1] - step, 6))
+
+        self.level = 0
+        self.scale = 1.0
+        self.surface = display
+        self.average = 0.0
+        self.cooldown = self.COOLDOWN
+        self.images = {}
+
+    def measure(self, frame_time):
+        self.average += (frame_time - self.average) * self.SMOOTHING
+        if self.cooldown > 0:
+            self.cooldown -= 1
+            return False
+
+        level = self.level
+        if self.average > self.budget and level + 1 < len(self.scales):
+            level += 1
+        elif level > 0:
+            # Assume the time grows with the number of pixels, which overestimates as not all of it is drawing
+            growth = (self.scales[level - 1] / self.scales[level]) ** 2
+            if self.average * growth < self.budget * self.HEADROOM:
+                level -= 1
+
+        if level == self.level:
+            return False
+        self.set_level(level)
+        return True
+
+    def set_level(self, level):
+        self.level = level
+        self.scale = self.scales[level]
+        self.cooldown = self.COOLDOWN
+        if self.scale == 1:
+            self.surface = self.display
+        else:
+            width, height = self.display.get_size()
+            self.surface = pygame.Surface((round(width * self.scale), round(height * self.scale))).convert()
+
+    def image(self, image):
+        if self.scale == 1:
+            return image
+        key = (image, self.scale)
+        scaled = self.images.get(key)
+        if scaled is None:
+            width, height = image.get_size()
+            size = (max(1, round(width * self.scale)), max(1, round(height * self.scale)))
+            scaled = self.images[key] = pygame.transform.smoothscale(image, size)
+        return scaled
+
+    def present(self):
+        if self.surface is not self.display:
+            pygame.transform.scale(self.surface, self.display.get_size(), self.display)
+
+
+class LayeredRenderer:
+    """
+    Builds each frame from cached layers so only the moving objects are drawn every frame
+
+    The static layer is the background colour and the bins, which only change when a new layout is generated, the
+    game ends or the render resolution changes. The HUD text is drawn over a copy of it to make the base layer, which
+    is only rebuilt when the text changes. Each frame the base is copied to the screen in one opaque blit and the
+    moving objects (the dynamic layer) are drawn over it.
+    When nothing has changed and there are no moving objects, such as on the game over screen, the frame already on
+    screen is still right, so nothing is drawn or sent to the display at all
+
+    Attributes:
+        static: pygame.Surface
+            Cached background colour and bins
+
+        base: pygame.Surface
+            The static layer with the HUD drawn over it
+
+        key: object
+            Identifies the current static layer, it is rebuilt when this changes
+
+        hud: dict
+            name -> (text surface, rect) of the HUD drawn into the base
+
+        shown: bool
+            Whether the frame on screen is the base with nothing over it, so an unchanged frame can be skipped
+
+    Methods:
+        begin(surface: pygame.Surface, key, draw_static, hud: dict, dynamic: bool) -> bool
+            Starts a frame, rebuilding any layer that changed and drawing the base onto surface. dynamic is whether
+            anything will be drawn over the base. Returns False when the frame on screen is already right and
+            nothing needs to be drawn or updated
+    """
+    def __init__(self):
+        self.static = None
+        self.base = None
+        self.key = None
+        self.hud = None
+        self.shown = False
+
+    def begin(self, surface, key, draw_static, hud, dynamic):
+        size = surface.get_size()
+        changed = False
+
+        # Static layer, in the same format as the surface so copying it is a plain memory copy
+        if key != self.key or self.static is None or self.static.get_size() != size:
+            self.key = key
+            self.static = pygame.Surface(size).convert(surface)
+            draw_static(self.static)
+            self.hud = None
+            changed = True
+
+        # HUD layer, drawn over a copy of the static layer
+        if hud != self.hud:
+            self.hud = hud
+            self.base = self.static.copy()
+            self.base.blits(list(hud.values()), doreturn=False)
+            changed = True
+
+        if not changed and not dynamic and self.shown:
+            return False
+
+        surface.blit(self.base, (0, 0))
+        self.shown = not dynamic
+        return True
+
+
+class DirtyRenderer:
+    """
+    Renders only the parts of the screen that changed since the last frame
+
+    The static parts of a frame (background colour and bins) are drawn once into a cached background surface.
+    Each frame the areas the moving objects covered last frame are restored from that background, HUD text is only
+    redrawn when it changes or something was drawn over it, and only the changed rectangles are sent to
+    pygame.display.update instead of the whole window
+
+    Attributes:
+        surface: pygame.Surface
+            The display surface being drawn to
+
+        background: pygame.Surface
+            Cached copy of everything that doesn't move
+
+        key: object
+            Identifies the current background, the background is rebuilt and the whole screen redrawn when it changes
+
+        hud: dict
+            name -> (text surface, rect) of the HUD drawn last frame
+
+        previous: list[pygame.Rect], moving: list[pygame.Rect]
+            Areas covered by moving objects last frame and this frame
+
+        dirty: list[pygame.Rect]
+            Areas restored or redrawn this frame that aren't moving objects
+
+    Methods:
+        begin(key, draw_background, hud: dict)
+            Starts a frame, rebuilding the background if key has changed, restoring the previous frame's moving objects
+            and drawing any HUD text that changed. HUD entries are name -> (text surface, rect)
+
+        add(rects: list[pygame.Rect])
+            Marks areas drawn to by moving objects this frame
+
+        finish()
+            Sends the changed areas to the display
+    """
+    def __init__(self, surface):
+        self.surface = surface
+        self.background = surface.copy()
+        self.key = None
+
+        self.hud = {}
+        self.previous = []
+        self.moving = []
+        self.dirty = []
+        self.full = True
+
+    def begin(self, key, draw_background, hud):
+        # Rebuild the background and redraw everything if it has changed since last frame
+        if key != self.key:
+            self.key = key
+            draw_background(self.background)
+            self.surface.blit(self.background, (0, 0))
+            self.full = True
+            self.previous = []
+            self.hud = {}
+
+        # Cover up the moving objects from last frame with the background
+        restored = [self.surface.blit(self.background, rect, rect) for rect in self.previous]
+
+        # Cover up HUD text that has changed or been removed
+        for name, (text, rect) in self.hud.items():
+            if hud.get(name) != (text, rect):
+                restored.append(self.surface.blit(self.background, rect, rect))
+
+        # Draw HUD text that is new or had part of it covered up
+        self.dirty = restored
+        for name, (text, rect) in hud.items():
+            if self.full or self.hud.get(name) != (text, rect) or rect.collidelist(restored) != -1:
+                self.dirty.append(self.surface.blit(text, rect))
+
+        self.hud = hud
+        self.moving = []
+
+    def add(self, rects):
+        self.moving.extend(rects)
+
+    def finish(self):
+        if self.full:
+            pygame.display.update()
+            self.full = False
+        else:
+            pygame.display.update(self.dirty + self.moving)
+
+        self.previous = self.moving
+
+
+def histogram(counts, size, color):
+    """
+    :return surface: pygame.Surface:
+    Bar chart of counts filling a transparent surface of the given size, the tallest bar reaching the top
+    """
+    surface = pygame.Surface(size, pygame.SRCALPHA)
+    width, height = size
+    tallest = max(counts, default=0)
+    if not tallest:
+        return surface
+
+    for i, count in enumerate(counts):
+        # Each bucket gets an equal slice of the width with a pixel left between the bars
+        left = i * width // len(counts)
+        right = (i + 1) * width // len(counts)
+        bar = round(count / tallest * height)
+        if bar:
+            surface.fill(color, (left, height - bar, max(1, right - left - 1), bar))
+    return surface
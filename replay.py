@@ -0,0 +1,200 @@
+"""
+Recording and playback of game sessions
+
+A session is fully described by the simulation's seed and settings plus the input bitmask and dt of every frame,
+as simulation.Simulation is deterministic. The recorder stores those in arrays and writes them to a small
+compressed binary file. The player feeds them back into a new Simulation, either as fast as possible without
+rendering or at the speed they were recorded at.
+
+The final score, lives and state are saved with the recording, so replaying a folder of recordings works as a
+regression test for the simulation:
+    python replay.py recordings/*.ttr
+"""
+import sys
+import time
+import zlib
+import struct
+from array import array
+
+import simulation
+from simulation import FRAMECAP
+
+# File layout: header, bin types, then the zlib compressed inputs followed by the dts
+# Header: magic, version, seed, bin area left and right, barrage size, flags, layout catalog checksum and tier,
+#         number of bin types, number of frames, final score, lives and state
+REPLAY_MAGIC = b"TTRP"
+REPLAY_VERSION = 4
+REPLAY_HEADER = struct.Struct("<4sHQiiIBIBHIiiB")
+PIXEL_COLLISIONS = 1 # Flag set when the simulation used pixel collisions
+CATALOG = 2 # Flag set when the layouts were picked from a layout catalog
+
+
+class Replay:
+    """
+    A recorded session
+
+    Attributes:
+        seed: int, bin_types: tuple[int], bin_area: tuple[int, int], barrage_size: int, pixel_collisions: bool
+            Settings the Simulation was created with
+
+        catalog_checksum: int, tier: int
+            Checksum of the layout catalog the layouts were picked from and the tier, None and 0 without a catalog
+            The same catalog has to be installed to play the recording back
+
+        inputs: array
+            Input bitmask of each frame, one byte per frame
+
+        dts: array
+            Timestep of each frame as a double so playback is exact
+
+        result: tuple
+            (score, lives, state) of the simulation when recording finished, None while still recording
+
+    Methods:
+        record(inputs: int, dt: float)
+            Adds a frame to the recording
+
+        finish(sim: simulation.Simulation)
+            Stores the final state of the recorded simulation
+
+        save(path: str), load(path: str) -> Replay
+            Writes and reads the binary file
+
+        simulation() -> simulation.Simulation
+            Creates a new simulation with the recorded seed and settings, raising a ValueError if the recording
+            needs a layout catalog that isn't installed
+
+        play(realtime: bool) -> simulation.Simulation
+            Runs the whole recording through a new simulation and returns it
+
+        verify() -> bool
+            Plays the recording as fast as possible and checks it ends in the recorded state
+    """
+    def __init__(self, seed, bin_types=(0, 1, 2), bin_area=(400, simulation.SIZE_X-simulation.BASE_BIN_SIZE*2),
+                 barrage_size=0, pixel_collisions=False, catalog_checksum=None, tier=0):
+        self.seed = seed
+        self.bin_types = tuple(bin_types)
+        self.bin_area = tuple(bin_area)
+        self.barrage_size = barrage_size
+        self.pixel_collisions = pixel_collisions
+        self.catalog_checksum = catalog_checksum
+        self.tier = tier
+
+        self.inputs = array("B")
+        self.dts = array("d")
+
+        self.result = None
+
+    @classmethod
+    def of(cls, sim):
+        """Starts an empty recording for the given simulation, which must not have been stepped yet"""
+        checksum = sim.catalog.checksum if sim.catalog is not None else None
+        return cls(sim.seed, sim.bin_types, sim.bin_area, sim.barrage_size, sim.pixel_collisions, checksum, sim.tier)
+
+    def __len__(self):
+        return len(self.inputs)
+
+    def record(self, inputs, dt):
+        self.inputs.append(inputs)
+        self.dts.append(dt)
+
+    def finish(self, sim):
+        self.result = (sim.score, sim.lives, sim.state)
+
+    def save(self, path):
+        score, lives, state = self.result or (0, 0, 0)
+
+        # array stores values in the machine's byte order, files are always little endian
+        dts = array("d", self.dts)
+        if sys.byteorder == "big":
+            dts.byteswap()
+
+        with open(path, "wb") as file:
+            file.write(REPLAY_HEADER.pack(
+                REPLAY_MAGIC, REPLAY_VERSION, self.seed, *self.bin_area, self.barrage_size,
+                (PIXEL_COLLISIONS if self.pixel_collisions else 0) | (CATALOG if self.catalog_checksum is not None else 0),
+                self.catalog_checksum or 0, self.tier, len(self.bin_types), len(self), score, lives, state
+            ))
+            file.write(bytes(self.bin_types))
+            file.write(zlib.compress(self.inputs.tobytes() + dts.tobytes(), 9))
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            data = file.read()
+
+        (magic, version, seed, left, right, barrage_size, flags, checksum, tier,
+         type_count, frames, score, lives, state) = REPLAY_HEADER.unpack_from(data)
+        if magic != REPLAY_MAGIC or version != REPLAY_VERSION:
+            raise ValueError(f"{path} is not a version {REPLAY_VERSION} replay")
+
+        position = REPLAY_HEADER.size
+        replay = cls(seed, data[position:position+type_count], (left, right), barrage_size,
+                     bool(flags & PIXEL_COLLISIONS), checksum if flags & CATALOG else None, tier)
+        replay.result = (score, lives, state)
+
+        frame_data = zlib.decompress(data[position+type_count:])
+        replay.inputs.frombytes(frame_data[:frames])
+        replay.dts.frombytes(frame_data[frames:])
+        if sys.byteorder == "big":
+            replay.dts.byteswap()
+        return replay
+
+    def simulation(self):
+        catalog = None
+        if self.catalog_checksum is not None:
+            # Imported here as the catalog needs NumPy, which replays without one don't
+            import layouts
+            catalog = layouts.load()
+            if catalog is None or catalog.checksum != self.catalog_checksum:
+                raise ValueError("the recording was made with a different layout catalog than the one installed")
+
+        shapes = None
+        if self.pixel_collisions:
+            # Imported here as the masks are made from the images with pygame, which replays without them don't need
+            import sprites
+            shapes = sprites.collision_shapes()
+
+        return simulation.Simulation(self.seed, self.bin_types, self.bin_area, self.barrage_size,
+                                     shapes, catalog, self.tier)
+
+    def play(self, realtime=False):
+        sim = self.simulation()
+        started = time.perf_counter()
+        elapsed = 0
+
+        for inputs, dt in zip(self.inputs, self.dts):
+            sim.step(inputs, dt)
+
+            # Wait until the frame would have happened when it was recorded
+            if realtime:
+                elapsed += dt / FRAMECAP
+                delay = started + elapsed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+        return sim
+
+    def verify(self):
+        sim = self.play()
+        return (sim.score, sim.lives, sim.state) == self.result
+
+
+def main(paths):
+    failed = 0
+    started = time.perf_counter()
+    frames = 0
+
+    for path in paths:
+        replay = Replay.load(path)
+        frames += len(replay)
+        if not replay.verify():
+            failed += 1
+            print(f"FAIL {path}")
+
+    seconds = time.perf_counter() - started
+    print(f"{len(paths)-failed}/{len(paths)} replays passed, {frames} frames in {seconds:.2f}s")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
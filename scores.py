@@ -0,0 +1,262 @@
+"""
+High scores and session stats for Trash Tosser
+
+Every finished game is appended to a log file as a fixed size record. Writing to disk can take any amount of time so
+the game never does it itself: finished sessions are put on a queue and a background thread writes everything that
+has built up in one go. Every so often the thread compacts the log, folding the old sessions into a single totals
+record and keeping only the best ones, so the file doesn't grow forever.
+The leaderboard is kept sorted in memory, so showing it on the game over screen doesn't touch the disk either.
+
+File layout: header, then records one after another, a totals record first once the log has been compacted.
+Record: kind, when it was written, then for a session the seed, score, throws that scored, landed in the wrong bin
+and stopped, and how many frames it lasted. A totals record has the same fields summed over every folded session
+with the seed field holding how many sessions there were
+"""
+import os
+import bisect
+import queue
+import struct
+import threading
+import logging
+from collections import namedtuple
+
+SCORES_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), "scores.log")
+SCORES_MAGIC = b"TTSC"
+SCORES_VERSION = 1
+SCORES_HEADER = struct.Struct("<4sH")
+# Record: kind, timestamp, seed (or number of sessions), score, scored, wrong bins, stopped, frames
+SCORES_RECORD = struct.Struct("<BdQIIIId")
+
+SESSION = 0
+TOTALS = 1
+
+# Sessions kept in the log and the leaderboard when compacting, the rest only count towards the totals
+KEEP = 100
+# Sessions appended between compactions
+COMPACT_EVERY = 256
+
+# A finished game. The totals of every game played have the number of games as seed
+Session = namedtuple("Session", ["timestamp", "seed", "score", "scored", "wrong", "stopped", "frames"])
+
+
+def empty_totals():
+    return Session(0, 0, 0, 0, 0, 0, 0)
+
+
+def add_totals(totals, session, count=1):
+    """Returns totals with session added to them, counting it as count games. A negative count takes it away"""
+    sign = 1 if count >= 0 else -1
+    return Session(max(totals.timestamp, session.timestamp), totals.seed + count,
+                   *(total + value*sign for total, value in zip(totals[2:], session[2:])))
+
+
+def read_log(path):
+    """
+    :return totals, sessions, complete: (Session, list[Session], bool):
+    Totals folded into the log by compaction, every session after them, and False if the last record was cut off
+    part way by the game closing while it was written, in which case it is ignored
+    """
+    totals = empty_totals()
+    sessions = []
+    if not os.path.exists(path):
+        return totals, sessions, True
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if len(data) < SCORES_HEADER.size:
+        return totals, sessions, not data
+    magic, version = SCORES_HEADER.unpack_from(data)
+    if magic != SCORES_MAGIC or version != SCORES_VERSION:
+        raise ValueError(f"{path} is not a version {SCORES_VERSION} score log")
+
+    end = len(data) - (len(data) - SCORES_HEADER.size) % SCORES_RECORD.size
+    for kind, *fields in SCORES_RECORD.iter_unpack(data[SCORES_HEADER.size:end]):
+        if kind == TOTALS:
+            totals = Session(*fields)
+        else:
+            sessions.append(Session(*fields))
+    return totals, sessions, end == len(data)
+
+
+def write_log(path, totals, sessions):
+    """Replaces the log with the given totals and sessions, writing a new file first so a crash can't lose it"""
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as file:
+        file.write(SCORES_HEADER.pack(SCORES_MAGIC, SCORES_VERSION))
+        file.write(SCORES_RECORD.pack(TOTALS, *totals))
+        for session in sessions:
+            file.write(SCORES_RECORD.pack(SESSION, *session))
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary, path)
+
+
+class Leaderboard:
+    """
+    Sessions sorted from the highest score, keeping only the best few
+
+    Attributes:
+        sessions: list[Session]
+            The best sessions, ties sorted by whoever got there first
+
+        keys: list[tuple]
+            Sort key of each session, for bisect
+
+        keep: int
+            How many sessions are kept
+
+    Methods:
+        insert(session: Session)
+            Adds a session if it is good enough to be kept
+    """
+    def __init__(self, keep=KEEP):
+        self.keep = keep
+        self.sessions = []
+        self.keys = []
+
+    def insert(self, session):
+        key = (-session.score, session.timestamp)
+        index = bisect.bisect_right(self.keys, key)
+        if index < self.keep:
+            self.keys.insert(index, key)
+            self.sessions.insert(index, session)
+            del self.keys[self.keep:], self.sessions[self.keep:]
+
+
+class ScoreStore:
+    """
+    High score table and session stats written to disk by a background thread
+
+    Attributes:
+        path: str
+            Log file the sessions are written to
+
+        leaderboard: Leaderboard, totals: Session
+            The best sessions and every session summed together, including the ones still waiting to be written
+            The background thread keeps its own copies of both for what is in the log
+
+        loaded: threading.Event
+            Set once the log has been read by the background thread
+
+        queue: queue.Queue
+            Sessions waiting to be written, None tells the thread to stop
+
+    Methods:
+        add(session: Session)
+            Adds a session to the leaderboard and queues it to be written, never waits for the disk
+
+        top(count: int) -> list[Session]
+            The best count sessions, highest score first. Sessions from the log only show up once it has been loaded
+
+        flush(timeout: float = None) -> bool
+            Waits until every queued session has been written, returning False if it timed out
+
+        close()
+            Writes every queued session and stops the background thread
+    """
+    def __init__(self, path=SCORES_PATH, keep=KEEP, compact_every=COMPACT_EVERY):
+        self.path = path
+        self.keep = keep
+        self.compact_every = compact_every
+
+        # The leaderboard is read by the game and updated by both threads, so it is only touched with the lock held
+        self.lock = threading.Lock()
+        self.leaderboard = Leaderboard(keep)
+        self.totals = empty_totals()
+
+        self.loaded = threading.Event()
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="scores", daemon=True)
+        self.thread.start()
+
+    def add(self, session):
+        with self.lock:
+            self.leaderboard.insert(session)
+            self.totals = add_totals(self.totals, session)
+        self.queue.put(session)
+
+    def top(self, count):
+        with self.lock:
+            return self.leaderboard.sessions[:count]
+
+    def flush(self, timeout=None):
+        # Queue.join can't time out, so wait on its condition directly
+        with self.queue.all_tasks_done:
+            return self.queue.all_tasks_done.wait_for(lambda: not self.queue.unfinished_tasks, timeout)
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+    def run(self):
+        """Background thread, loads the log then writes sessions in batches as they are queued"""
+        # A log that can't be read is replaced by the first write instead of being appended to
+        try:
+            totals, sessions, complete = read_log(self.path)
+            replace = not complete
+        except (OSError, ValueError) as error:
+            logging.warning(f"Couldn't read the score log, starting a new one: {error}")
+            totals, sessions = empty_totals(), []
+            replace = True
+
+        # What is in the log, the totals of every session in it and the best of them
+        stored = Leaderboard(self.keep)
+        for session in sessions:
+            totals = add_totals(totals, session)
+            stored.insert(session)
+
+        # Sessions added while the log was loading are already in the game's copies
+        with self.lock:
+            for session in stored.sessions:
+                self.leaderboard.insert(session)
+            # The log's totals count as however many sessions they were made from
+            self.totals = add_totals(self.totals, totals, totals.seed)
+        self.loaded.set()
+
+        appended = len(sessions)
+        stopping = False
+        while not stopping:
+            # Wait for a session, then take everything else that built up while waiting so it is written in one go
+            batch = [self.queue.get()]
+            while True:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = None in batch
+            sessions = [session for session in batch if session is not None]
+
+            for session in sessions:
+                totals = add_totals(totals, session)
+                stored.insert(session)
+
+            try:
+                if sessions:
+                    appended += len(sessions)
+                    if replace or appended >= self.compact_every:
+                        self.compact(totals, stored.sessions)
+                        appended = 0
+                        replace = False
+                    else:
+                        self.append(sessions)
+            except OSError as error:
+                logging.warning(f"Couldn't write to the score log: {error}")
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def append(self, sessions):
+        new = not os.path.exists(self.path) or os.path.getsize(self.path) < SCORES_HEADER.size
+        with open(self.path, "ab") as file:
+            if new:
+                file.truncate(0)
+                file.write(SCORES_HEADER.pack(SCORES_MAGIC, SCORES_VERSION))
+            file.write(b"".join(SCORES_RECORD.pack(SESSION, *session) for session in sessions))
+
+    def compact(self, totals, best):
+        """Rewrites the log as the totals of every session and the best ones"""
+        # Sessions kept in the log are counted again when it is read, so they are left out of the stored totals
+        for session in best:
+            totals = add_totals(totals, session, -1)
+        write_log(self.path, totals, best)
@@ -0,0 +1,775 @@
+"""
+Headless simulation core for Trash Tosser
+
+Everything that decides the outcome of a throw lives in here: the trash physics, bin collisions, lives and score.
+Nothing in this module touches pygame, the display or the wall clock, so it can be stepped as fast as the CPU allows
+on machines without a screen. Time is measured in frames (one frame = 1/FRAMECAP seconds) and every random choice
+goes through a seeded random.Random so a run can be reproduced exactly from its seed and inputs.
+
+The windowed game in trashtosser.py is a renderer on top of Simulation.step()
+"""
+import bisect
+import math
+import random
+
+# Game window dimensions
+SIZE_X = 1120
+SIZE_Y = 560
+
+# Constant rate of gravity which is applied by moving the trash object down each frame
+GRAVITY = 1
+
+FRAMECAP = 60 # Target framerate, also the amount of simulation time units in one second
+
+BASE_PLAYER_SIZE = 64
+BASE_BIN_SIZE = 128
+
+TRAJECTORY_BALLS = 15 # Amount of trajectory prediction orbs to calculate
+
+# Power limits for the launch velocity scalar
+MIN_POWER = 0.5
+MAX_POWER = 3
+
+# Input bitmask flags, combined with | and passed to Simulation.step
+LEFT = 1
+RIGHT = 2
+UP = 4
+DOWN = 8
+SHIFT = 16
+LAUNCH = 32 # Edge triggered, set only on the frame space was pressed
+RESTART = 64 # Edge triggered, only has an effect on the game over screen
+BARRAGE = 128 # Edge triggered, throws a barrage around the current aim when barrages are enabled
+EDGE_TRIGGERED = LAUNCH | RESTART | BARRAGE # Inputs that should only be passed to a single step
+
+# Game states
+PLAYING = 0
+GAME_OVER = 1
+
+# Throw results and events returned by Simulation.step
+SCORED = 1
+WRONG_BIN = 2
+STOPPED = 3
+
+
+# Parts of a bin the trash can touch, returned by Bin.contact
+MOUTH = 0 # Landing in the bin
+SIDE = 1 # Hitting the body of the bin from the side, bounces horizontally
+TOP = 2 # Hitting the body of the bin from above or below, bounces vertically
+
+# Farthest the trash moves between pixel collision tests while it is over a bin, in pixels
+SAMPLE_DISTANCE = 3
+
+FLOOR = SIZE_Y - BASE_PLAYER_SIZE # Highest y position of the trash where it is touching the floor
+INFINITY = float("inf")
+
+
+def rects_collide(a, b):
+    """Returns True if two (x, y, w, h) rectangles overlap, using the same rules as pygame.Rect.colliderect"""
+    return a[0] < b[0]+b[2] and b[0] < a[0]+a[2] and a[1] < b[1]+b[3] and b[1] < a[1]+a[3]
+
+
+def roots(a, b, c):
+    """Real roots of a*t^2 + b*t + c = 0 (a > 0) from lowest to highest, or (inf, inf) if there are none"""
+    discriminant = b*b - 4*a*c
+    if discriminant < 0:
+        return INFINITY, INFINITY
+    discriminant = math.sqrt(discriminant)
+    return (-b - discriminant) / (2*a), (-b + discriminant) / (2*a)
+
+
+def floor_time(y, vy):
+    """Time until trash at height y with vertical velocity vy falls onto the floor"""
+    # The trash is falling through the floor when it is past the higher root of y + vy*t + g/2*t^2 = FLOOR
+    _, time = roots(GRAVITY/2, vy, y - FLOOR)
+    if time > 0:
+        return time
+    return 0 if y >= FLOOR else INFINITY
+
+
+def wall_time(x, vx):
+    """Time until trash at x with horizontal velocity vx leaves the sides of the screen"""
+    if vx < 0:
+        return max(-x / vx, 0)
+    if vx > 0:
+        return max((SIZE_X - x) / vx, 0)
+    return 0 if 0 > x or x > SIZE_X else INFINITY
+
+
+def time_of_impact(x, y, vx, vy, rect, end):
+    """
+    Earliest time in [0, end) when the trash, moving along its parabola from (x, y), overlaps the (x, y, w, h) rect
+    Returns None if it doesn't hit the rect before end
+
+    The trash is a BASE_PLAYER_SIZE square with (x, y) as its top left corner
+    """
+    left, top, width, height = rect
+
+    # Horizontally the trash moves in a straight line, find when it is between the left and right of the rect
+    if vx == 0:
+        if not left - BASE_PLAYER_SIZE < x < left + width:
+            return None
+        x_start, x_end = -INFINITY, INFINITY
+    else:
+        x_start, x_end = sorted(((left - BASE_PLAYER_SIZE - x) / vx, (left + width - x) / vx))
+
+    # Vertically it moves along y + vy*t + g/2*t^2, which is above the bottom of the rect between the roots of one
+    # quadratic and below the top of the rect outside the roots of another
+    above_bottom = roots(GRAVITY/2, vy, y - (top + height))
+    below_top = roots(GRAVITY/2, vy, y - (top - BASE_PLAYER_SIZE))
+
+    # That leaves up to two intervals, before the trash rises above the top and after it falls back below it
+    for start, stop in ((above_bottom[0], min(above_bottom[1], below_top[0])),
+                        (max(above_bottom[0], below_top[1]), above_bottom[1])):
+        start = max(start, x_start, 0)
+        if start < min(stop, x_end, end):
+            return start
+    return None
+
+
+class Trash:
+    """
+    Physics state of a piece of trash
+
+    The trash follows its exact parabola between steps, and bounces, bin hits and leaving the screen are found by
+    solving for the moment they happen rather than by checking once a frame. This makes the outcome of a throw the
+    same no matter how long each step is, so large steps can't skip through bins or the floor.
+    With pixel collisions the mask is rotated to the angle at the start of each step, so only the spin depends on
+    the step size
+
+    Attributes:
+        x, y: float
+            Position of the objects top left corner
+
+        vx, vy: float
+            Velocity in pixels per frame
+
+        angle: float
+            Rotation of the sprite in degrees, only used for drawing
+
+        type: int
+            0 represents chips, 1 represents paper and 2 represents an apple, matching the bin types
+
+        paused: bool
+            True while the player is aiming, False once the object has been launched
+
+        power: float
+            Scalar for the launch velocity, kept between MIN_POWER and MAX_POWER
+
+        initial_length: float
+            The initial magnitude of the velocity vector, used to calculate the scaling of the power
+
+        old_trajectory: list[tuple]
+            The trajectory of the last launch so the player can compare it with the current one
+
+        shape: collision.TrashShape
+            Masks used for pixel collisions with the bins, None to collide as a BASE_PLAYER_SIZE square
+
+        trajectory_balls: int, trajectory_spacing: float
+            Number of orbs in the predicted trajectory and frames between them, more and closer orbs give a longer
+            and denser preview
+
+    Methods:
+        update(dt: float, inputs: int, bins: BinIndex) -> (Bin, float)
+            Moves the object along its path for dt frames, or aims it if it is paused
+            bins can also be a list of bins, which is indexed on every call
+            Returns the first bin hit and how far into the step it was hit, or None and dt
+
+        move(t: float)
+            Moves the object along its parabola for t frames without checking for collisions
+
+        launch()
+            Stops aiming and sends the object flying
+
+        aim(angle: float, power: float)
+            Sets the launch direction and power directly instead of through inputs
+
+        trajectory() -> list[tuple]
+            Predicted (x, y, radius) orbs for the current aim, only recalculated when the position or velocity changes
+
+        flipy()
+            Flip the velocity vertically and lower the speed as objects lose speed when they bounce
+
+        flipx()
+            Flip the velocity horizontally and lower the speed, for bouncing off the side of a bin
+
+        reset(rng: random.Random)
+            Moves the object back to the start with a new random type
+    """
+    def __init__(self, x, y, vx, vy, type):
+        self.x = x
+        self.y = y
+        self.vx = vx
+        self.vy = vy
+
+        self.angle = 0
+        self.type = type
+
+        self.paused = True
+        self.power = 1
+        self.initial_length = math.hypot(vx, vy)
+
+        self.old_trajectory = []
+        self.shape = None
+
+        self.trajectory_balls = TRAJECTORY_BALLS
+        self.trajectory_spacing = 1
+        # The last predicted trajectory and the (x, y, vx, vy, balls, spacing) it was predicted for
+        self.trajectory_key = None
+        self.trajectory_orbs = []
+
+    @property
+    def moving(self):
+        return self.vx != 0 or self.vy != 0
+
+    @property
+    def rect(self):
+        return self.x, self.y, BASE_PLAYER_SIZE, BASE_PLAYER_SIZE
+
+    def aim_angle(self):
+        """Angle of the velocity above the horizontal in degrees, the same as vel.angle_to(Vector2(1,0))"""
+        return -math.degrees(math.atan2(self.vy, self.vx))
+
+    def rotate(self, degrees):
+        """Rotates the velocity in place, the same as pygame's Vector2.rotate_ip"""
+        radians = math.radians(degrees)
+        sin = math.sin(radians)
+        cos = math.cos(radians)
+        self.vx, self.vy = self.vx*cos - self.vy*sin, self.vx*sin + self.vy*cos
+
+    def scale_velocity(self):
+        """Scales the velocity magnitude to the initial length times the power"""
+        length = math.hypot(self.vx, self.vy)
+        scale = self.initial_length * self.power / length
+        self.vx *= scale
+        self.vy *= scale
+
+    def aim(self, angle, power):
+        self.power = min(max(power, MIN_POWER), MAX_POWER)
+        radians = math.radians(angle)
+        speed = self.initial_length * self.power
+        self.vx = math.cos(radians) * speed
+        self.vy = -math.sin(radians) * speed
+
+    def launch(self):
+        self.old_trajectory = self.trajectory()
+        self.paused = False
+
+    def trajectory(self):
+        # The aim only changes while keys are held, so most frames reuse the last prediction
+        key = (self.x, self.y, self.vx, self.vy, self.trajectory_balls, self.trajectory_spacing)
+        if key == self.trajectory_key:
+            return self.trajectory_orbs
+
+        # Positions along the parabola after t frames, measured from the centre of the object
+        # The orbs shrink from a radius of 5 to 1.5 along the trajectory (5-i/4 for the default 15 orbs)
+        cx = self.x + BASE_PLAYER_SIZE/2
+        cy = self.y + BASE_PLAYER_SIZE/2
+        shrink = 3.5 / max(self.trajectory_balls - 1, 1)
+        orbs = []
+        for i in range(self.trajectory_balls):
+            t = i * self.trajectory_spacing
+            orbs.append((cx + t*self.vx, cy + t*(self.vy + 0.5*GRAVITY*t), 5 - i*shrink))
+
+        self.trajectory_key = key
+        self.trajectory_orbs = orbs
+        return orbs
+
+    def move(self, t):
+        self.x += self.vx * t
+        self.y += self.vy * t + GRAVITY/2 * t*t
+        self.vy += GRAVITY * t
+
+    def update(self, dt, inputs, bins=None):
+        if self.paused:
+            self.aim_inputs(dt, inputs)
+            return None, dt
+
+        if bins is None:
+            bins = BinIndex([])
+        elif not isinstance(bins, BinIndex):
+            bins = BinIndex(bins)
+
+        if self.moving:
+            # Spin one degree per frame in the direction of travel
+            self.angle -= dt if self.vx > 0 else -dt
+
+        # Jump from event to event (bounces, leaving the screen, hitting a bin) until the step is used up
+        elapsed = 0
+        stuck = 0 # Bounces in a row off a bin that didn't move the trash
+        while elapsed < dt and self.moving:
+            remaining = dt - elapsed
+            floor = floor_time(self.y, self.vy)
+            wall = wall_time(self.x, self.vx)
+            event = min(floor, wall, remaining)
+
+            # Only bins near the horizontal path up to the event can be hit, rotated masks reach a little further
+            end_x = self.x + self.vx*event
+            margin = self.shape.margin if self.shape is not None else 0
+            nearby = bins.query(min(self.x, end_x) - margin, max(self.x, end_x) + BASE_PLAYER_SIZE + margin)
+
+            # Only bins touched strictly before the current earliest event count, so the leftmost bin wins ties
+            hit = None
+            for bin in nearby:
+                contact = bin.contact(self, event)
+                if contact is not None:
+                    hit, (event, part) = bin, contact
+            self.move(event)
+            elapsed += event
+
+            if hit is not None:
+                if part == MOUTH:
+                    return hit, elapsed
+
+                # Bounce off the body of the bin. Getting wedged against it without moving stops the trash
+                stuck = stuck + 1 if event == 0 else 0
+                if stuck > 3:
+                    self.vx = self.vy = 0
+                elif part == SIDE:
+                    self.flipx()
+                else:
+                    self.flipy()
+                continue
+
+            if event == wall:
+                # Set the velocity to zero if the object leaves the game frame so the game can reset quicker
+                self.vx = self.vy = 0
+            elif event == floor:
+                self.y = FLOOR
+                # If the object is going very slow then stop it instead of bouncing so it doesn't jitter up and down
+                if abs(self.vx) < 5 and abs(self.vy) < 5:
+                    self.vx = self.vy = 0
+                # Otherwise, flip the y velocity and slow the object down
+                else:
+                    self.flipy()
+
+        return None, elapsed
+
+    def aim_inputs(self, dt, inputs):
+        # Make the modifier lower if shift is held down so the aiming can be more fine-tuned
+        mod = 0.3 if inputs & SHIFT else 1
+
+        # Rotate with left and right and restricting rotation to 180 degrees to the right
+        if inputs & LEFT and self.aim_angle() < 90:
+            self.rotate(-mod * dt)
+        if inputs & RIGHT and self.aim_angle() > -90:
+            self.rotate(mod * dt)
+
+        # Change power with up and down by scaling the velocity magnitude by the initial length times the scalar
+        if inputs & UP and self.power < MAX_POWER:
+            self.power += mod * 0.02 * dt
+            self.scale_velocity()
+        if inputs & DOWN and self.power > MIN_POWER:
+            self.power -= mod * 0.02 * dt
+            self.scale_velocity()
+
+    def flipy(self):
+        # Only flip if the object is moving
+        if self.moving:
+            self.vy *= -0.8
+            self.vx *= 0.66
+
+    def flipx(self):
+        if self.moving:
+            self.vx *= -0.66
+
+    def reset(self, rng):
+        # Reset all attributes of the object and generate a new type
+        self.x, self.y = 20, 400
+        self.vx, self.vy = 10, -10
+        self.paused = True
+        self.power = 1
+        self.angle = 0
+        self.type = rng.randint(0, 2)
+
+
+class Bin:
+    """
+    Collision state of a rubbish bin, the goal for the player to shoot the trash into
+
+    Attributes:
+        x, y: int
+            Position of the top left corner, bins always sit on the floor
+
+        type: int
+            0 represents a landfill bin, 1 represents a recycling bin and 2 represents an organic bin
+
+        collider: tuple
+            The (x, y, w, h) rect the trash has to hit, shrunk by 10 pixels on each side so only a solid hit counts
+
+        shape: collision.BinShape
+            Masks of the bin's mouth and body for pixel collisions, None to only use the collider
+
+        bounds: tuple
+            The (x, y, w, h) rect the trash can touch, the collider or the rect around the shape's solid pixels
+
+    Methods:
+        time_of_impact(trash: Trash, end: float) -> float
+            Returns how long until the trash hits the collider, or None if it doesn't within end frames
+
+        contact(trash: Trash, end: float) -> (float, int)
+            Returns how long until the trash touches the bin and which part it touches (MOUTH, SIDE or TOP), or None
+            if it doesn't within end frames. Without shapes every hit on the collider counts as the mouth
+
+        result(trash: Trash) -> int
+            SCORED if the trash is the same type as the bin, WRONG_BIN otherwise
+    """
+    def __init__(self, x, type, shape=None):
+        self.x = x
+        self.y = SIZE_Y - BASE_BIN_SIZE
+        self.type = type
+
+        self.collider = (self.x+10, self.y+10, BASE_BIN_SIZE-20, BASE_BIN_SIZE-20)
+        self.shape = shape
+
+    @property
+    def bounds(self):
+        if self.shape is None:
+            return self.collider
+        x, y, w, h = self.shape.bounds
+        return self.x + x, self.y + y, w, h
+
+    @property
+    def rect(self):
+        return self.x, self.y, BASE_BIN_SIZE, BASE_BIN_SIZE
+
+    def time_of_impact(self, trash, end):
+        return time_of_impact(trash.x, trash.y, trash.vx, trash.vy, self.collider, end)
+
+    def contact(self, trash, end):
+        if self.shape is None or trash.shape is None:
+            time = self.time_of_impact(trash, end)
+            return None if time is None else (time, MOUTH)
+
+        mask, offset_x, offset_y = trash.shape.get(trash.angle)
+        left, top, width, height = self.bounds
+
+        # Broadphase: when the rotated mask's box overlaps the bin's box, found the same way as for the collider by
+        # growing the box by the difference between the mask's size and the square time_of_impact expects
+        box = (
+            left - offset_x - mask.width + BASE_PLAYER_SIZE,
+            top - offset_y - mask.height + BASE_PLAYER_SIZE,
+            width + mask.width - BASE_PLAYER_SIZE,
+            height + mask.height - BASE_PLAYER_SIZE
+        )
+
+        x, y, vx, vy = trash.x, trash.y, trash.vx, trash.vy
+        start = 0
+        while True:
+            time = time_of_impact(x, y, vx, vy, box, end - start)
+            if time is None:
+                return None
+            time += start
+
+            # Narrowphase: test the masks every few pixels until they touch or the boxes stop overlapping
+            previous = None
+            while time < end:
+                t = time - start
+                px = x + vx*t
+                py = y + vy*t + GRAVITY/2*t*t
+                step = SAMPLE_DISTANCE / max(math.hypot(vx, vy + GRAVITY*t), 1)
+                if not rects_collide((px, py, BASE_PLAYER_SIZE, BASE_PLAYER_SIZE), box):
+                    break
+
+                dx = round(px + offset_x) - self.x
+                dy = round(py + offset_y) - self.y
+                if self.shape.mouth.overlap(mask, dx, dy):
+                    return time, MOUTH
+
+                # Touching the body straight away means the trash is already against it, so it is left to move off
+                # instead of bouncing on the spot
+                if time > 0 and self.shape.body.overlap(mask, dx, dy):
+                    if previous is None:
+                        # Touched as soon as the boxes met, so it bounces from just before they met, off the side if
+                        # the boxes were already level
+                        before = px - vx*step
+                        level = before < box[0] + box[2] and box[0] < before + BASE_PLAYER_SIZE
+                        return max(time - step, start), TOP if level else SIDE
+
+                    # Bounce from the last position that didn't touch. The bounce is horizontal if moving only
+                    # horizontally from there touches but moving only vertically doesn't, corners bounce up
+                    previous_time, previous_x, previous_y = previous
+                    side = self.shape.body.overlap(mask, dx, round(previous_y + offset_y) - self.y)
+                    top = self.shape.body.overlap(mask, round(previous_x + offset_x) - self.x, dy)
+                    return previous_time, SIDE if side and not top else TOP
+
+                previous = (time, px, py)
+                time += step
+            else:
+                return None
+
+            # Left the bin's box without touching it, but the trash can still come back down into it later
+            time += step
+            t = time - start
+            x, y, vy = x + vx*t, y + vy*t + GRAVITY/2*t*t, vy + GRAVITY*t
+            start = time
+
+    def result(self, trash):
+        return SCORED if self.type == trash.type else WRONG_BIN
+
+
+class BinIndex:
+    """
+    Bins sorted by position so only the bins near the trash's path need to be checked for collisions
+
+    Attributes:
+        bins: list[Bin]
+            The bins sorted from left to right
+
+        lefts: list[int]
+            The left edge of each bin's bounds, in the same order
+
+        width: int
+            Width of the widest bounds, how far left of a range a bin can start and still reach into it
+
+    Methods:
+        query(left: float, right: float) -> list[Bin]
+            Returns the bins whose bounds overlap the horizontal range from left to right
+    """
+    def __init__(self, bins):
+        self.bins = sorted(bins, key=lambda bin: bin.bounds[0])
+        self.lefts = [bin.bounds[0] for bin in self.bins]
+        self.width = max((bin.bounds[2] for bin in self.bins), default=0)
+
+    def __iter__(self):
+        return iter(self.bins)
+
+    def __len__(self):
+        return len(self.bins)
+
+    def query(self, left, right):
+        start = bisect.bisect_right(self.lefts, left - self.width)
+        end = bisect.bisect_left(self.lefts, right)
+        return self.bins[start:end]
+
+
+def gen_bins(rng, types=(0, 1, 2), left=400, right=SIZE_X-BASE_BIN_SIZE*2):
+    """
+    Generates a bin for each type in types with their left edges between left and right, none of them overlapping
+
+    Rather than placing bins at random and retrying when they overlap, the free space left over once every bin is
+    packed together is split randomly into the gaps between them. This always finishes in one pass no matter how
+    many bins there are, and raises a ValueError if they can't fit at all
+    """
+    count = len(types)
+    slack = right - left - (count-1)*BASE_BIN_SIZE
+    if slack < 0:
+        raise ValueError(f"{count} bins don't fit between {left} and {right}")
+
+    # Sorted random offsets into the free space, each bin is pushed right by the bins before it
+    offsets = sorted(rng.randint(0, slack) for _ in range(count))
+    positions = [left + offset + i*BASE_BIN_SIZE for i, offset in enumerate(offsets)]
+
+    # Shuffle the types so each type can end up anywhere in the row
+    types = list(types)
+    rng.shuffle(types)
+    return [Bin(x, type) for x, type in zip(positions, types)]
+
+
+class Simulation:
+    """
+    A complete game of Trash Tosser without any rendering
+
+    Attributes:
+        seed: int
+            Seed of the random number generator, the same seed and inputs always produce the same game
+            A random seed is picked if None is given
+
+        rng: random.Random
+            Generator used for every random choice (trash type, bin positions)
+
+        trash: Trash
+            The piece of trash currently being aimed or thrown
+
+        bin_types: tuple[int]
+            The type of each bin to generate, more than one bin can have the same type
+
+        bin_area: tuple[int, int]
+            Range the left edges of the bins are placed in
+
+        bins: list[Bin], index: BinIndex
+            The bins in the current layout, and the same bins indexed for collision checks
+
+        score: int, lives: int
+            Points scored and lives remaining
+
+        state: int
+            PLAYING or GAME_OVER
+
+        time: float
+            Simulated time in frames since the game started
+
+        barrage_size: int, barrage: swarm.TrashStore
+            Pieces of trash thrown by each BARRAGE input, and the pieces in flight
+            Barrages are disabled and barrage is None when barrage_size is 0
+            Pieces landing in the right bin are counted by the barrage instead of adding to score, so a barrage
+            can't put a game on the leaderboard, and the wrong bin doesn't cost a life
+
+        pixel_collisions: bool, shapes: collision.Shapes
+            Whether the trash collides with the bins using masks of their images, and the masks, made from the images
+            by the caller with sprites.collision_shapes() so this module never needs pygame
+            Without them the trash is a square that scores whenever it hits a bin's collider
+            Barrages always use the colliders
+
+        catalog: layouts.Catalog, tier: int
+            Prebuilt layouts to pick from and the difficulty tier to pick them from for the trash being thrown,
+            instead of generating them
+            Layouts are generated with bin_types and bin_area when catalog is None
+
+        generation: int
+            Incremented on every reset so renderers know when the layout has changed
+
+    Methods:
+        step(inputs: int, dt: float) -> list[int]
+            Advances the game by dt frames with the given input bitmask and returns the events that happened
+
+        reset()
+            Resets the trash and generates a new bin layout
+
+        restart()
+            Starts a new game after a game over
+    """
+    def __init__(self, seed=None, bin_types=(0, 1, 2), bin_area=(400, SIZE_X-BASE_BIN_SIZE*2), barrage_size=0,
+                 shapes=None, catalog=None, tier=0):
+        # Pick a seed if none was given so the game can still be reproduced from it later
+        self.seed = seed if seed is not None else random.randrange(2**32)
+        self.rng = random.Random(self.seed)
+
+        self.trash = Trash(20, 400, 10, -10, 0)
+        self.bin_types = bin_types
+        self.bin_area = bin_area
+        self.bins = []
+        self.index = BinIndex([])
+
+        self.score = 0
+        self.lives = 3
+        self.state = PLAYING
+
+        self.time = 0
+
+        # Used to wait a second after the ball stops before restarting
+        self.stopped_at = None
+        # Used to display the wrong bin message for three seconds only
+        self.wrong_bin_at = None
+
+        self.barrage_size = barrage_size
+        self.barrage = None
+        if barrage_size:
+            # Imported here as the store needs NumPy, and swarm imports this module through batch
+            import swarm
+            self.barrage = swarm.TrashStore(barrage_size)
+
+        self.shapes = shapes
+        self.pixel_collisions = shapes is not None
+
+        self.catalog = catalog
+        self.tier = tier
+
+        self.generation = 0
+        self.reset()
+
+    @property
+    def wrong_bin(self):
+        """True while the wrong bin message should be shown"""
+        return self.wrong_bin_at is not None and self.time - self.wrong_bin_at <= 3*FRAMECAP
+
+    def step(self, inputs, dt=1):
+        events = []
+        self.time += dt
+
+        if inputs & RESTART and self.state == GAME_OVER:
+            self.restart()
+        if inputs & LAUNCH and self.trash.paused:
+            self.trash.launch()
+
+        # Only calculate game logic if game is running (e.g. not in menu)
+        if self.state != PLAYING:
+            return events
+
+        # Barrages are thrown from where the trash is being aimed from, with its aim
+        if inputs & BARRAGE and self.barrage is not None and self.trash.paused:
+            self.barrage.fire(self.trash.x, self.trash.y, self.trash.aim_angle(), self.trash.power,
+                              self.barrage_size, self.rng.randrange(2**32))
+        if self.barrage is not None:
+            # Pieces in the right bin are counted by the barrage itself and kept out of the score
+            self.barrage.update(dt, self.bins)
+
+        # Move the trash, stopping at the first bin it hits. Lose a life if the bin type is incorrect and gain a point if it is correct
+        start = self.time - dt
+        hit, elapsed = self.trash.update(dt, inputs, self.index)
+        if hit is not None:
+            if hit.result(self.trash) == SCORED:
+                self.score += 1
+                events.append(SCORED)
+            else:
+                self.lives -= 1
+                self.wrong_bin_at = start + elapsed
+                events.append(WRONG_BIN)
+            self.reset()
+
+        # If the ball isn't moving, wait 1 second before resetting and losing a life
+        elif not self.trash.moving:
+            if self.stopped_at is None:
+                self.stopped_at = start + elapsed
+            if self.time - self.stopped_at > FRAMECAP:
+                self.stopped_at = None
+                self.lives -= 1
+                events.append(STOPPED)
+                if self.lives != 0:
+                    self.reset()
+
+        # Set state to gameover screen if no lives remain
+        if self.lives <= 0:
+            self.state = GAME_OVER
+
+        return events
+
+    def reset(self):
+        self.trash.reset(self.rng)
+        if self.catalog is not None:
+            # Tiers are ranked for each trash type, so the layout is picked for the trash that was just chosen
+            self.bins = self.catalog.sample(self.rng, self.tier, self.trash.type)
+        else:
+            self.bins = gen_bins(self.rng, self.bin_types, *self.bin_area)
+        if self.shapes is not None:
+            self.trash.shape = self.shapes.trash[self.trash.type]
+            for bin in self.bins:
+                bin.shape = self.shapes.bins[bin.type]
+        self.index = BinIndex(self.bins)
+        self.generation += 1
+
+    def restart(self):
+        self.reset()
+        self.state = PLAYING
+        self.score = 0
+        self.lives = 3
+        self.wrong_bin_at = None
+        if self.barrage is not None:
+            self.barrage.clear()
+
+
+def simulate_throw(bins, type, angle, power, max_frames=10000, shapes=None):
+    """
+    Throws a single piece of trash at the given bins and returns (result, time) without touching any game state
+
+    The result is SCORED, WRONG_BIN or STOPPED and time is how many frames into the throw it happened.
+    The whole throw is solved in one update as the outcome doesn't depend on the step size.
+    Pass shapes to collide with the masks of the bins, which must have their shapes set as well. The throw is then
+    stepped a frame at a time so the mask spins the same way as in the game
+    """
+    trash = Trash(20, 400, 10, -10, type)
+    trash.aim(angle, power)
+    trash.paused = False
+
+    if shapes is None:
+        hit, time = trash.update(max_frames, 0, bins)
+    else:
+        trash.shape = shapes.trash[type]
+        bins = BinIndex(bins)
+        hit, time = None, 0
+        while hit is None and trash.moving and time < max_frames:
+            hit, elapsed = trash.update(1, 0, bins)
+            time += elapsed
+
+    if hit is not None:
+        return hit.result(trash), time
+    return STOPPED, time
@@ -1,62 +1,215 @@
+"""
+Lazy loading of the game's images
+
+Images are only loaded the first time they are asked for, and converted to the display's pixel format once a window
+exists so blitting them doesn't need a conversion every frame. Nothing is loaded on import, so this module can be
+imported without a display.
+
+Images are read from a prebuilt asset pack (res/assets.pack) when one exists. The pack holds every image already
+scaled as raw RGBA pixels and is memory-mapped, so no PNG has to be decoded on launch. Build it with
+    python sprites.py
+and rebuild it whenever an image in res/img changes
+"""
 import os
+import sys
+import mmap
+import struct
+
 import pygame
 
+import collision
+from simulation import BASE_PLAYER_SIZE, BASE_BIN_SIZE
 
 RES_DIR = os.path.join(os.path.abspath(os.path.dirname(__file__)), "res")
-BASE_PLAYER_SIZE = 64
-BASE_BIN_SIZE = 128
+PACK_PATH = os.path.join(RES_DIR, "assets.pack")
 
-icon = pygame.transform.scale(
-    pygame.image.load(
-        os.path.join(RES_DIR,"img","icon.png")
-    ), (64,64)
-)
+# Every image in the game, name -> (file in res/img, size it is scaled to)
+IMAGES = {
+    "icon": ("icon.png", (64, 64)),
 
-# Helper function
-def bin(type: int):
-    if type == 0:
-        return bin_plastic
-    elif type == 1:
-        return bin_recycling
-    elif type == 2:
-        return bin_organic
-    else:
-        return pygame.Surface((0,0))
+    "bin_plastic": ("plasticbin.png", (BASE_BIN_SIZE, BASE_BIN_SIZE)),
+    "bin_recycling": ("recyclingbin.png", (BASE_BIN_SIZE, BASE_BIN_SIZE)),
+    "bin_organic": ("organicbin.png", (BASE_BIN_SIZE, BASE_BIN_SIZE)),
+
+    "chips": ("chipbag.png", (BASE_PLAYER_SIZE, BASE_PLAYER_SIZE)),
+    "paper": ("PaperBall.png", (BASE_PLAYER_SIZE, BASE_PLAYER_SIZE)),
+    "apple": ("apple.png", (BASE_PLAYER_SIZE, BASE_PLAYER_SIZE)),
+}
+
+# Image names indexed by bin and trash type
+BINS = ["bin_plastic", "bin_recycling", "bin_organic"]
+TRASH = ["chips", "paper", "apple"]
+
+# Asset pack layout: header, then one entry per image, then the pixel data
+# Header: magic, version, number of entries
+# Entry: name length, name, width, height, offset of the pixels from the start of the file
+PACK_MAGIC = b"TTPK"
+PACK_VERSION = 1
+PACK_HEADER = struct.Struct("<4sHH")
+PACK_ENTRY = struct.Struct("<HHQ")
+
+_images = {} # Loaded images by name
+_converted = set() # Names of the images that have been converted to the display format
+_pack = None # (mmap, {name: (width, height, offset)}) once the pack has been opened, False if there is no pack
+_shapes = None # Collision shapes made from the images
+
+
+def _open_pack():
+    global _pack
+    if _pack is not None:
+        return _pack
+
+    if not os.path.exists(PACK_PATH):
+        _pack = False
+        return _pack
+
+    with open(PACK_PATH, "rb") as file:
+        data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, count = PACK_HEADER.unpack_from(data, 0)
+    # Ignore packs from other versions and fall back to the PNGs
+    if magic != PACK_MAGIC or version != PACK_VERSION:
+        data.close()
+        _pack = False
+        return _pack
+
+    entries = {}
+    position = PACK_HEADER.size
+    for _ in range(count):
+        length, = struct.unpack_from("<H", data, position)
+        name = data[position+2:position+2+length].decode()
+        position += 2 + length
+        entries[name] = PACK_ENTRY.unpack_from(data, position)
+        position += PACK_ENTRY.size
+
+    _pack = (data, entries)
+    return _pack
+
+
+def _read_png(name):
+    """Decodes and scales the PNG of an image, raising a FileNotFoundError naming the image if it is missing"""
+    file, size = IMAGES[name]
+    path = os.path.join(RES_DIR, "img", file)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Image {name!r} is missing, expected it at {path}")
+    return pygame.transform.scale(pygame.image.load(path), size)
+
+
+def _load(name):
+    """Loads an image from the asset pack if it is in there, otherwise from its PNG"""
+    pack = _open_pack()
+    if pack and name in pack[1]:
+        data, entries = pack
+        width, height, offset = entries[name]
+        # The surface shares memory with the mapped file so nothing is copied until it is converted
+        return pygame.image.frombuffer(memoryview(data)[offset:offset + width*height*4], (width, height), "RGBA")
+
+    return _read_png(name)
 
 
-bin_plastic = pygame.transform.scale(pygame.image.load(
-        os.path.join(RES_DIR,"img","plasticbin.png")
-    ), (BASE_BIN_SIZE,BASE_BIN_SIZE))
+def get(name):
+    """Returns the image with the given name, loading it the first time and converting it once a window exists"""
+    image = _images.get(name)
+    if image is None:
+        image = _images[name] = _load(name)
 
-bin_recycling = pygame.transform.scale(pygame.image.load(
-        os.path.join(RES_DIR,"img","recyclingbin.png")
-    ), (BASE_BIN_SIZE,BASE_BIN_SIZE))
+    if name not in _converted and pygame.display.get_surface() is not None:
+        image = _images[name] = image.convert_alpha()
+        _converted.add(name)
+
+    return image
+
+
+def preload():
+    """Loads every image up front instead of on first use"""
+    for name in IMAGES:
+        get(name)
+
+
+def check():
+    """Raises a FileNotFoundError naming every image that is neither in the asset pack nor in res/img, loading none"""
+    pack = _open_pack()
+    missing = [name for name, (file, _) in IMAGES.items()
+               if not (pack and name in pack[1]) and not os.path.exists(os.path.join(RES_DIR, "img", file))]
+    if missing:
+        raise FileNotFoundError(f"Images missing from {os.path.join(RES_DIR, 'img')}: {', '.join(missing)}")
+
+
+def build_pack(path=PACK_PATH):
+    """Decodes and scales every PNG and writes them to an asset pack"""
+    images = []
+    for name in IMAGES:
+        image = _read_png(name)
+        images.append((name.encode(), image.get_size(), pygame.image.tostring(image, "RGBA")))
+
+    # The pixel data starts after the header and every entry
+    offset = PACK_HEADER.size + sum(2 + len(name) + PACK_ENTRY.size for name, _, _ in images)
+
+    with open(path, "wb") as file:
+        file.write(PACK_HEADER.pack(PACK_MAGIC, PACK_VERSION, len(images)))
+        for name, (width, height), pixels in images:
+            file.write(struct.pack("<H", len(name)) + name)
+            file.write(PACK_ENTRY.pack(width, height, offset))
+            offset += len(pixels)
+        for _, _, pixels in images:
+            file.write(pixels)
+
+
+def surface_mask(image):
+    """Returns a collision.Mask of the solid pixels of a surface"""
+    width, height = image.get_size()
+    return collision.Mask.from_alpha(width, height, pygame.image.tostring(image, "RGBA")[3::4])
+
+
+def mask(name):
+    """Returns a collision.Mask of the solid pixels of the image with the given name"""
+    return surface_mask(get(name))
+
+
+def collision_shapes():
+    """Returns the collision shapes of every trash and bin type, making them from the images the first time"""
+    global _shapes
+    if _shapes is None:
+        def rotator(name):
+            # Rotating the image itself is much faster than rotating the mask in Python, and matches what is drawn
+            image = get(name)
+            def rotate(angle):
+                return (surface_mask(pygame.transform.rotate(image, angle)),
+                        *collision.rotation_offset(*image.get_size(), angle))
+            return rotate
+
+        _shapes = collision.Shapes(
+            trash=[collision.TrashShape(mask(name), rotate=rotator(name)) for name in TRASH],
+            bins=[collision.BinShape(mask(name)) for name in BINS]
+        )
+    return _shapes
 
-bin_organic = pygame.transform.scale(pygame.image.load(
-        os.path.join(RES_DIR,"img","organicbin.png")
-    ), (BASE_BIN_SIZE,BASE_BIN_SIZE))
 
 # Helper function
-def trash(type: int):
-    if type == 0:
-        return chips
-    elif type == 1:
-        return paper
-    elif type == 2:
-        return apple
+def bin(type: int):
+    if 0 <= type < len(BINS):
+        return get(BINS[type])
     else:
         return pygame.Surface((0,0))
 
-apple = pygame.transform.scale(pygame.image.load(
-    os.path.join(RES_DIR, "img", "apple.png")
-), (BASE_PLAYER_SIZE, BASE_PLAYER_SIZE))
+# Helper function
+def trash(type: int):
+    if 0 <= type < len(TRASH):
+        return get(TRASH[type])
+    else:
+        return pygame.Surface((0,0))
 
-paper = pygame.transform.scale(pygame.image.load(
-    os.path.join(RES_DIR, "img", "paperball.png")
-), (BASE_PLAYER_SIZE, BASE_PLAYER_SIZE))
 
-chips = pygame.transform.scale(pygame.image.load(
-    os.path.join(RES_DIR, "img", "chipbag.png")
-), (BASE_PLAYER_SIZE, BASE_PLAYER_SIZE))
+def __getattr__(name):
+    # Images can still be used as module attributes (sprites.icon) but are only loaded when accessed
+    if name in IMAGES:
+        return get(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
+if __name__ == "__main__":
+    try:
+        build_pack()
+    except FileNotFoundError as error:
+        sys.exit(f"Couldn't build the asset pack: {error}")
+    print(f"Wrote {len(IMAGES)} images to {PACK_PATH}")
@@ -0,0 +1,131 @@
+"""
+Many pieces of trash in flight at once for Trash Tosser
+
+The barrage mode throws hundreds or thousands of pieces of trash at the bins at the same time. Keeping each of them
+as a simulation.Trash object would mean a Python loop over every piece every frame, so instead the pieces are stored
+as a struct of arrays (one NumPy array per field, one element per piece) and the whole barrage is moved with a single
+call to batch.advance. The physics are the same as Trash.update so a piece in a barrage flies exactly like one
+thrown on its own.
+"""
+import numpy as np
+
+import batch
+
+# How far the pieces of a barrage are spread around the aim, in degrees and power
+ANGLE_SPREAD = 6
+POWER_SPREAD = 0.25
+
+
+class TrashStore:
+    """
+    Pieces of trash in flight, stored as parallel arrays
+
+    Only the first count elements of each array are live pieces, the rest is spare capacity so spawning doesn't
+    allocate every time. Pieces are removed by packing the live ones to the front of the arrays.
+
+    Attributes:
+        count: int
+            Number of pieces in flight
+
+        x, y, vx, vy, angle: array
+            Position, velocity and sprite rotation of each piece, the same as the Trash fields
+
+        type: array
+            Trash type of each piece
+
+        scored: int, wrong: int
+            Pieces that landed in the right and the wrong bin since the store was created or last cleared
+
+    Methods:
+        spawn(x, y, vx, vy, types)
+            Adds pieces, each argument can be an array or a single value shared by all of them
+
+        fire(x: float, y: float, angle: float, power: float, count: int, seed: int)
+            Adds count pieces launched from (x, y) spread randomly around the given aim
+
+        update(dt: float, bins: list[simulation.Bin]) -> (int, int)
+            Moves every piece for dt frames, removes the ones that hit a bin or stopped
+            Returns how many landed in the right bin and how many in the wrong one
+
+        clear()
+            Removes every piece and resets the counts
+    """
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.capacity = 0
+        self.x = self.y = self.vx = self.vy = self.angle = np.empty(0)
+        self.type = np.empty(0, dtype=np.int8)
+        self.reserve(capacity)
+
+        self.scored = 0
+        self.wrong = 0
+
+    def __len__(self):
+        return self.count
+
+    def reserve(self, capacity):
+        """Grows the arrays so they hold at least capacity pieces, doubling so repeated spawns stay cheap"""
+        if capacity <= self.capacity:
+            return
+        capacity = max(capacity, self.capacity * 2)
+        for name in ("x", "y", "vx", "vy", "angle", "type"):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.count] = old[:self.count]
+            setattr(self, name, new)
+        self.capacity = capacity
+
+    def spawn(self, x, y, vx, vy, types):
+        added = np.broadcast(x, y, vx, vy, types).size
+        self.reserve(self.count + added)
+
+        new = slice(self.count, self.count + added)
+        self.x[new] = x
+        self.y[new] = y
+        self.vx[new] = vx
+        self.vy[new] = vy
+        self.angle[new] = 0
+        self.type[new] = types
+        self.count += added
+
+    def fire(self, x, y, angle, power, count, seed):
+        rng = np.random.default_rng(seed)
+        angles = angle + rng.normal(0, ANGLE_SPREAD, count)
+        powers = power + rng.normal(0, POWER_SPREAD, count)
+        vx, vy = batch.launch_velocities(angles, powers)
+        self.spawn(x, y, vx, vy, rng.integers(0, 3, count))
+
+    def update(self, dt, bins):
+        if not self.count:
+            return 0, 0
+        live = slice(0, self.count)
+        x, y, vx, vy = self.x[live], self.y[live], self.vx[live], self.vy[live]
+
+        # Spin one degree per frame in the direction of travel, as Trash.update does
+        moving = (vx != 0) | (vy != 0)
+        self.angle[live] -= np.where(moving, np.where(vx > 0, dt, -dt), 0)
+
+        # The slices are views so the pieces are moved in place
+        hit, _ = batch.advance(x, y, vx, vy, dt, bins)
+
+        hits = hit >= 0
+        bin_types = np.array([bin.type for bin in bins] + [-1])
+        scored = int(np.count_nonzero(hits & (self.type[live] == bin_types[hit])))
+        wrong = int(np.count_nonzero(hits)) - scored
+        self.scored += scored
+        self.wrong += wrong
+
+        # Pack the pieces still flying to the front of the arrays
+        keep = ~hits & ((vx != 0) | (vy != 0))
+        remaining = int(np.count_nonzero(keep))
+        if remaining != self.count:
+            for array in (self.x, self.y, self.vx, self.vy, self.angle, self.type):
+                array[:remaining] = array[live][keep]
+            self.count = remaining
+
+        return scored, wrong
+
+    def clear(self):
+        self.count = 0
+        self.scored = 0
+        self.wrong = 0
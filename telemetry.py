@@ -0,0 +1,274 @@
+"""
+Telemetry and remote control server for Trash Tosser
+
+An optional local server streaming the state of every frame to connected clients and accepting inputs from them,
+used for automated soak tests and dashboards. The server runs an asyncio event loop on its own thread so the game
+loop never waits on a socket: the game hands each frame's state to the loop and reads the inputs that have arrived
+since the last frame, both without blocking.
+Each client has a short queue of frames waiting to be sent. When a client can't keep up its queue fills and new frames
+are dropped for it instead of holding up the game or the other clients.
+
+Protocol, one line per message in both directions:
+    server -> client: a JSON object per frame with the trash's position, velocity and angle, score, lives, state and
+                      frame timings, or an error for a bad command
+    client -> server: input names separated by spaces (LEFT RIGHT UP DOWN SHIFT LAUNCH RESTART BARRAGE), applied to
+                      the next frame, or QUIT to close the game
+
+The server listens on TCP for host:port addresses and on a Unix socket for anything else, which is taken as a path.
+Running this file is a client stand-in that prints the telemetry and sends the given commands:
+    python telemetry.py 127.0.0.1:7777 --send "LEFT SHIFT" --send LAUNCH --frames 600
+"""
+import sys
+import json
+import queue
+import asyncio
+import argparse
+import threading
+import logging
+
+import simulation
+
+# Input names accepted from clients
+REMOTE_INPUTS = {
+    "LEFT": simulation.LEFT,
+    "RIGHT": simulation.RIGHT,
+    "UP": simulation.UP,
+    "DOWN": simulation.DOWN,
+    "SHIFT": simulation.SHIFT,
+    "LAUNCH": simulation.LAUNCH,
+    "RESTART": simulation.RESTART,
+    "BARRAGE": simulation.BARRAGE,
+}
+QUIT = "QUIT"
+
+CLIENT_QUEUE_SIZE = 64 # Frames waiting to be sent to a client before new ones are dropped for it
+
+
+def parse_address(address):
+    """Returns (host, port) for a host:port address, or the path of a Unix socket"""
+    host, separator, port = address.rpartition(":")
+    if separator and port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return address
+
+
+def parse_command(line):
+    """
+    :return inputs, quit: (int, bool):
+    Input bitmask of a command line and whether it asked to quit, raising a ValueError for unknown names
+    """
+    inputs = 0
+    quit = False
+    for name in line.upper().split():
+        if name == QUIT:
+            quit = True
+        elif name in REMOTE_INPUTS:
+            inputs |= REMOTE_INPUTS[name]
+        else:
+            raise ValueError(f"unknown input {name}")
+    return inputs, quit
+
+
+class TelemetryServer:
+    """
+    Local server streaming frames to clients and collecting their inputs, run on a background thread
+
+    Attributes:
+        address: tuple or str
+            (host, port) or Unix socket path being listened on, with the real port once started if 0 was given
+
+        loop: asyncio.AbstractEventLoop
+            Event loop of the server thread
+
+        clients: set[asyncio.Queue], writers: set[asyncio.StreamWriter]
+            Queue of frames waiting to be sent to each connected client and its connection, only touched on the
+            server thread
+
+        received: queue.SimpleQueue
+            Commands from clients waiting for the game to read them
+
+        sent: int, dropped: int
+            Frames queued for clients and frames dropped because a client's queue was full
+
+    Methods:
+        start()
+            Starts the server thread and waits until it is listening
+
+        publish(state: dict)
+            Sends a frame's state to every client, never waits
+
+        inputs() -> (int, bool)
+            Inputs received since the last call and whether a client asked to quit, never waits
+
+        close()
+            Disconnects every client and stops the server thread
+    """
+    def __init__(self, address):
+        self.address = parse_address(address) if isinstance(address, str) else address
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.ready = threading.Event()
+        self.error = None
+
+        self.clients = set()
+        self.writers = set()
+        self.client_count = 0 # Read by the game thread to skip building frames nobody is listening to
+        self.received = queue.SimpleQueue()
+
+        self.sent = 0
+        self.dropped = 0
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="telemetry", daemon=True)
+        self.thread.start()
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+    def run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.listen())
+        except OSError as error:
+            self.error = error
+            self.ready.set()
+            return
+        self.ready.set()
+        self.loop.run_forever()
+
+        # Disconnect whoever is left once close() stops the loop
+        self.loop.run_until_complete(self.shutdown())
+        self.loop.close()
+
+    async def shutdown(self):
+        self.server.close()
+        # Closing the connections ends every client's handler, which is cleaner than cancelling them
+        for writer in self.writers:
+            writer.close()
+        handlers = asyncio.all_tasks() - {asyncio.current_task()}
+        if handlers:
+            await asyncio.wait(handlers, timeout=1)
+
+    async def listen(self):
+        if isinstance(self.address, tuple):
+            self.server = await asyncio.start_server(self.serve, *self.address)
+            self.address = self.server.sockets[0].getsockname()[:2]
+        else:
+            self.server = await asyncio.start_unix_server(self.serve, self.address)
+
+    async def serve(self, reader, writer):
+        """Handles a connected client, sending it frames while reading its commands"""
+        frames = asyncio.Queue(CLIENT_QUEUE_SIZE)
+        self.clients.add(frames)
+        self.writers.add(writer)
+        self.client_count = len(self.clients)
+        sender = asyncio.create_task(self.send(frames, writer))
+        try:
+            while line := await reader.readline():
+                try:
+                    self.received.put(parse_command(line.decode(errors="replace")))
+                except ValueError as error:
+                    # Errors go through the same queue as frames so they are never written in the middle of one
+                    self.enqueue(frames, json.dumps({"error": str(error)}).encode() + b"\n")
+        except ConnectionError:
+            pass
+        finally:
+            self.clients.discard(frames)
+            self.writers.discard(writer)
+            self.client_count = len(self.clients)
+            sender.cancel()
+            writer.close()
+
+    async def send(self, frames, writer):
+        try:
+            while True:
+                writer.write(await frames.get())
+                await writer.drain()
+        except ConnectionError:
+            pass
+
+    def enqueue(self, frames, line):
+        try:
+            frames.put_nowait(line)
+            self.sent += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def broadcast(self, state):
+        # Encoded once on the server thread for every client, rather than on the game thread
+        line = json.dumps(state, separators=(",", ":")).encode() + b"\n"
+        for frames in self.clients:
+            self.enqueue(frames, line)
+
+    def publish(self, state):
+        if self.client_count:
+            self.loop.call_soon_threadsafe(self.broadcast, state)
+
+    def inputs(self):
+        inputs = 0
+        quit = False
+        while True:
+            try:
+                command_inputs, command_quit = self.received.get_nowait()
+            except queue.Empty:
+                return inputs, quit
+            inputs |= command_inputs
+            quit |= command_quit
+
+    def close(self):
+        if self.thread is None:
+            return
+        if self.loop is not None and self.loop.is_running():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.thread = None
+
+
+async def client(address, commands, frames):
+    """Connects to a server, sends the commands one per frame and prints frames until enough have been received"""
+    address = parse_address(address)
+    if isinstance(address, tuple):
+        reader, writer = await asyncio.open_connection(*address)
+    else:
+        reader, writer = await asyncio.open_unix_connection(address)
+
+    received = 0
+    commands = list(commands)
+    while frames is None or received < frames:
+        line = await reader.readline()
+        if not line:
+            break
+        print(line.decode().rstrip())
+        received += 1
+        if commands:
+            writer.write(commands.pop(0).encode() + b"\n")
+            await writer.drain()
+
+    writer.close()
+    await writer.wait_closed()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Print a Trash Tosser game's telemetry and send it inputs")
+    parser.add_argument("address", help="host:port or Unix socket path the game is listening on")
+    parser.add_argument("--send", action="append", default=[], metavar="COMMAND",
+                        help="inputs to send, one command per frame received, can be given more than once")
+    parser.add_argument("--frames", type=int, help="frames to receive before disconnecting, all of them by default")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(client(args.address, args.send, args.frames))
+    except (ConnectionError, FileNotFoundError) as error:
+        logging.error(f"Couldn't connect to {args.address}: {error}")
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
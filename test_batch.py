@@ -0,0 +1,32 @@
+"""
+Checks that batch solves throws the same way as the simulation
+
+The autoplayer, the layout catalog and barrages all rely on batch.solve_throws ending every throw the same way
+simulation.simulate_throw does, so the two are compared over a grid of throws at seeded random layouts
+"""
+import random
+
+import numpy as np
+import pytest
+
+import batch
+import simulation
+from simulation import MIN_POWER, MAX_POWER
+
+ANGLES = np.linspace(-90, 90, 31)
+POWERS = np.linspace(MIN_POWER, MAX_POWER, 11)
+TYPES = (0, 1, 2)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_solve_throws_matches_simulate_throw(seed):
+    bins = simulation.gen_bins(random.Random(seed))
+    results, times = batch.solve_throws(bins, np.array(TYPES)[:, None, None], ANGLES[None, :, None],
+                                        POWERS[None, None, :])
+
+    for t, type in enumerate(TYPES):
+        for a, angle in enumerate(ANGLES):
+            for p, power in enumerate(POWERS):
+                result, time = simulation.simulate_throw(bins, type, angle, power)
+                assert results[t, a, p] == result, (type, angle, power)
+                assert times[t, a, p] == pytest.approx(time, abs=1e-6), (type, angle, power)
@@ -1,7 +1,11 @@
-import random
 import os
+import sys
+import argparse
 import time
 import logging
+from collections import Counter
+
+STARTED = time.perf_counter() # When the module started importing, used to measure the time until the first frame
 
 # Hide the pygame support prompt
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
@@ -9,28 +13,42 @@ os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "1"
 import pygame
 from pygame import Vector2
 
+import autoplayer
+import layouts
+import profiler
+import render
+import replay
+import scores
+import simulation
 import sprites
+import telemetry
+from simulation import SIZE_X, SIZE_Y, FRAMECAP
 
 # Using the C API to change the app ModelID
 # This changes the taskbar icon from the python one to the game-specific one
-import ctypes
-appid = "pthompson.trashtosser.1.0" # Arbitrary app string that is arbitrary
-ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(appid)
-
-pygame.init()
-pygame.font.init()
-
-font = lambda size: pygame.font.Font(pygame.font.get_default_font(), size) # Font helper function that returns font of given size
-
-# Game window dimensions
-SIZE_X = 1120
-SIZE_Y = 560
-
-# Constant rate of gravity which is applied by moving the trash object down each frame
-GRAVITY = 1
-
-FRAMECAP = 60 # Target framerate
-CHECK_VECTOR = Vector2(1,0) # Horizontal vector so overall angle of objects can be measured
+# Only available on Windows, other platforms use the window icon
+if sys.platform == "win32":
+    import ctypes
+    appid = "pthompson.trashtosser.1.0" # Arbitrary app string that is arbitrary
+    ctypes.windll.shell32.SetCurrentProcessExplicitAppUserModelID(appid)
+
+BACKGROUND = (0, 0, 128) # Background colour behind everything
+
+IDLE_FPS = 10 # Framerate while nothing on screen is changing, such as on the game over screen
+LEADERBOARD_SIZE = 5 # High scores shown on the game over screen
+HISTOGRAM_BUCKETS = 20 # Bars in the overlay's histogram of frame times, which goes up to twice the frame budget
+
+# Longest stretch of real time simulated in one frame, so a long stall doesn't leave the game stepping forever to catch up
+MAX_FRAME_TIME = 0.25
+
+# Keys held down that are passed to the simulation as input flags
+KEY_INPUTS = {
+    pygame.K_LEFT: simulation.LEFT,
+    pygame.K_RIGHT: simulation.RIGHT,
+    pygame.K_UP: simulation.UP,
+    pygame.K_DOWN: simulation.DOWN,
+    pygame.K_LSHIFT: simulation.SHIFT,
+}
 
 class GameObject(pygame.sprite.Sprite):
     """
@@ -50,12 +68,13 @@ class GameObject(pygame.sprite.Sprite):
             Global rect offset by global coordinates used for collision and other inter-object interactions
 
     Methods:
-        update(dt: float, keys: list)
-            A function to process game logic taking deltatime and currently pressed down keys and arguments
+        update()
+            A function to copy position and rotation from the simulation object the sprite is drawing
             Has no effects on the base class but will be overridden in each game object
 
-        draw()
-            Draws the objects sprite to the screen, calculating rotations and position
+        draw(surface: pygame.Surface = None) -> list[pygame.Rect]
+            Draws the objects sprite to the screen, calculating rotations and position, and returns the areas drawn to
+            The position is in window coordinates and scaled to the game's render resolution when drawing
 
     """
     def __init__(self, parent, x, y, image=None, angle=0):
@@ -71,51 +90,33 @@ class GameObject(pygame.sprite.Sprite):
 
         self.global_rect = pygame.Rect(self.rect.x+x,self.rect.y+y,self.rect.w,self.rect.h) # Add the objects position to its local rect
 
-    def update(self, dt, keys):
+    def update(self):
         """
-        Class-specific method to update position, check collision, etc.. that is run every frame
+        Class-specific method to copy the latest simulation state onto the sprite that is run every frame
         On the base object it does nothing but should be overwritten for each object
         It exists here so an error is not raised if an object does not have it overwritten for whatever reason
         """
         pass
 
-    def draw(self):
+    def draw(self, surface=None):
         """
-        Rotates the sprite by appropriate angle and then draws to the game screen
+        Rotates the sprite by appropriate angle and then draws to the game screen, or the given surface
+        Returns a list of the areas that were drawn to
         """
-        if self.angle == 0: # Skip rotation calculations if there is no rotation
-            pos = (self.pos.x,self.pos.y)
-            image = self.image
-        else:
-            width,height = self.image.get_size()
-
-            # Calculating and rotating the bounding boxes for the new sprite
-            boundary = [
-                Vector2(0,0),
-                Vector2(width,0),
-                Vector2(width,-height),
-                Vector2(0,-height)
-            ]
-            boundary = [vector.rotate(self.angle) for vector in boundary]
-
-            min_x = min(boundary, key=lambda vec: vec.x)[0] # Getting the lowest x value of each vector in the bounding box using an anonymous function as the key
-            max_y = max(boundary, key=lambda vec: vec.y)[1] # Same thing but finding the max y value
-
-            center = Vector2(
-                (width/2),
-                -(height/2)
-            )
+        # The image and position are shrunk when the game is drawing at a lower resolution
+        resolution = self.game.resolution
+        image = resolution.image(self.image)
+        pos = (self.pos.x*resolution.scale, self.pos.y*resolution.scale)
 
-            rotation_offset = center.rotate(self.angle) - center
+        if self.angle != 0: # Skip rotation calculations if there is no rotation
+            # Rotated images and their offsets are cached by the game so each angle is only rotated once
+            image, offset = self.game.rotations.get(image, self.angle)
 
             pos = (
-                self.pos.x + min_x - rotation_offset.x,
-                self.pos.y + max_y - rotation_offset.y
+                pos[0] + offset[0],
+                pos[1] + offset[1]
             )
 
-            # Rotating the image before blitting it to the screen below
-            image = pygame.transform.rotate(self.image, self.angle)
-
         # Reassigning rect and global_rect with new positions
         self.rect = image.get_rect()
 
@@ -124,199 +125,283 @@ class GameObject(pygame.sprite.Sprite):
             self.rect.w, self.rect.h
         )
         # Rendering to screen the newly calculated image and position
-        self.game.surface.blit(image, pos)
+        return [(surface or self.game.surface).blit(image, pos)]
 
 class TrashObject(GameObject):
     """
-    Object representing a piece of trash and inheriting the GameObject class
+    Sprite drawing a simulation.Trash, inheriting the GameObject class
+    All of the physics and aiming is done by the simulation, this object only draws it
 
     Attributes:
-        pos: Vector2
-            The position vector of the objects top left corner relative to the origin
-
-        vel: Vector2
-            A relative vector representing the velocity. Coordinates are relative to TrashObject.pos as they are added each frame
-
-        initial_length: int
-            The initial magnitude of the velocity vector, used to calculate the scaling of the power used to launch the object
+        state: simulation.Trash
+            The simulated piece of trash this sprite follows
 
-        TRAJECTORY_BALLS: int
-            A constant value representing the amount of trajectory prediction orbs are to be calculated and drawn
-
-        trajectory: list[Vector2], old_trajectory: list[Vector2]
-            Lists of position vectors representing the predicted trajectory of the object
-            The trajectory for the last launch is also stored and shown in a lighter colour so the player can compare them
-
-        collider: pygame.Rect
-            A pygame rectangle effectively equal to the global rect plus the objects velocity. Used to calculate collisions with obstacles
+        type: int
+            The trash type the current image was loaded for, so the image is only swapped when the type changes
 
         Methods:
-            draw()
+            draw(surface: pygame.Surface = None) -> list[pygame.Rect]
                 Overrides the GameObject draw function as this trash object also requires the trajectories to be drawn.
                 Calls super().draw() at the end of the function so the sprite is still drawn as normal
 
-            update(dt: float, keys: list)
-                Overrides the GameObject update function with logic to calculate position, velocity, gravity, and aiming
+            update(alpha: float = 1)
+                Copies the position, angle and image from the simulation state, drawing the object alpha of the way
+                from its state before the last physics tick to its current state
 
-            flipy()
-                Flip the velocity vertically. Used in collision and bouncing calculations
-                Also lower the velocity by a factor of 1/3 as objects lose speed when they bounce
+        previous: tuple
+            (x, y, angle) of the simulation state before the last physics tick, None when it shouldn't be interpolated
+            from such as after the trash was reset
     """
-    def __init__(self, parent, x, y, vx, vy, type):
-        super().__init__(parent, x, y, sprites.trash(type))
-
-        self.type = type
+    def __init__(self, parent, state: simulation.Trash):
+        super().__init__(parent, state.x, state.y, sprites.trash(state.type), state.angle)
+
+        self.state = state
+        self.type = state.type
+        self.previous = None
+
+    def draw(self, surface=None):
+        surface = surface or self.game.surface
+
+        dots = self.game.dots
+        scale = self.game.resolution.scale
+
+        # Every orb is drawn from the cached dots with a single blits call
+        orbs = []
+        # Trajectory of the throw found by the autoplayer when assisting
+        if self.state.paused:
+            orbs += dots.blits(self.game.assist_trajectory, (0,255,0), scale)
+        orbs += dots.blits(self.state.old_trajectory, (128,128,255), scale)
+        if self.state.paused:
+            orbs += dots.blits(self.state.trajectory(), (255,255,255), scale)
+
+        rects = surface.blits(orbs) if orbs else []
+        return rects + super().draw(surface) # Calling parent draw to draw sprite
+
+    def update(self, alpha=1):
+        x, y, angle = self.state.x, self.state.y, self.state.angle
+        if self.previous is not None and alpha < 1:
+            old_x, old_y, old_angle = self.previous
+            x = old_x + (x - old_x) * alpha
+            y = old_y + (y - old_y) * alpha
+            angle = old_angle + (angle - old_angle) * alpha
+        self.pos.update(x, y)
+        self.angle = angle
 
-        # Position and velocity vectors
-        self.pos = Vector2(x,y)
-        self.vel = Vector2(vx,vy)
+        # The state is reused between resets so the image has to follow its type
+        if self.type != self.state.type:
+            self.type = self.state.type
+            self.image = sprites.trash(self.type)
 
-        self.paused = True
+class Bin(GameObject):
+    """
+    Sprite drawing a simulation.Bin, inheriting the GameObject class
 
-        self.initial_length = self.vel.magnitude()
+    Attributes:
+        state: simulation.Bin
+            The simulated bin this sprite draws. Bins never move so the position is only read once
 
-        # Scalar for the object so the launch power can be changed
-        self.power = 1
+        type: int
+            Used to represent what type of bin this object is.
+            0 represents a landfill bin, 1 represents a recycling bin and 2 represents and organic bin.
+    """
+    def __init__(self, parent, state: simulation.Bin):
+        super().__init__(parent, state.x, state.y, sprites.bin(state.type))
 
-        self.TRAJECTORY_BALLS = 15 # Amount of trajectory preciction orbs to display
+        self.state = state
+        self.type = state.type
 
-        self.trajectory = []
-        self.old_trajectory = []
+class Barrage(GameObject):
+    """
+    Sprite drawing every piece of a simulation barrage, inheriting the GameObject class
 
-        self.collider = pygame.Rect(self.global_rect.x + self.vel.x,
-                                    self.global_rect.y + self.vel.y,
-                                    self.global_rect.w,
-                                    self.global_rect.h) # Collision rect made by adding the velocity to the global rect
+    Attributes:
+        state: swarm.TrashStore
+            The pieces of trash in flight, read straight from the store's arrays every frame
 
-    def draw(self):
-        for dot in self.old_trajectory:
-            pygame.draw.circle(self.game.surface,(128,128,255), dot[0], dot[1])
-        if self.paused:
-            for dot in self.trajectory:
-                pygame.draw.circle(self.game.surface,(255,255,255),dot[0],dot[1])
-
-        super().draw() # Calling parent draw to draw sprite
-
-    def update(self, dt, keys):
-
-        # Set the velocity to zero if the object is outside the game frame so the game can reset quicker
-        if 0 > self.pos.x or self.pos.x > SIZE_X:
-            self.vel = Vector2(0,0)
-
-
-        # Calculate the trajectory indicators
-        if self.paused:
-            self.trajectory = []
-            for i in range(self.TRAJECTORY_BALLS):
-                # Some long calculations for finding the predicted location for each of the trajectory orbs
-                # Involves adding the number of the ball multiplied by the velocity plus the gravity to the position of the ball
-                # The size of the orb is also calculated using the number of the ball (5-i/4)
-                self.trajectory.append((self.pos+i*Vector2(self.vel.x,self.vel.y+0.5*GRAVITY*i)+Vector2(self.global_rect.w/2,self.global_rect.h/2), 5-i/4))
-
-        # Only calculate if the object is moving and not paused
-        if not self.paused and self.vel != Vector2(0,0):
-            self.angle -= 1 if self.vel.x > 0 else -1
-            # Apply velocity
-            self.pos += Vector2(self.vel.x,self.vel.y) * dt
-            # Apply gravity
-            self.vel.y += GRAVITY * dt
-
-            # If the object is off screen
-            if self.pos.y >= (SIZE_Y-self.rect.h) - (self.vel.y * dt):
-                # If the object is going very slow then don't flip it and set the velocity to 0 instead so it doesn't jitter up and down
-                if abs(self.vel.x) < 5 and abs(self.vel.y) < 5 and self.pos.y > (SIZE_Y-100):
-                    self.vel = Vector2(0, 0)
-                    self.pos.y = SIZE_Y-self.rect.h
-                # Otherwise, flip the y velocity and times the velocity by 2/3 of it's current
-                else:
-                    self.flipy()
-
-        # Make the modifier lower if shift is held down so the aiming can be more fine-tuned
-        if keys[pygame.K_LSHIFT]:
-            mod = 0.3
-        else:
-            mod = 1
-
-        if self.paused:
-            # Rotate with left and right arrows and restricting rotation to 180 degrees to the right
-            # Rotating using deltatime so the rotation is framerate independent
-            if keys[pygame.K_LEFT]:
-                if self.vel.angle_to(CHECK_VECTOR) < 90:
-                    self.vel.rotate_ip(-mod * dt)
-            if keys[pygame.K_RIGHT]:
-                if self.vel.angle_to(CHECK_VECTOR) > -90:
-                    self.vel.rotate_ip(mod * dt)
-
-            # Change power with up and down by scaling the velocity magnitude by the initial length times the scalar
-            if keys[pygame.K_UP]:
-                if self.power < 3:
-                    self.power += mod * 0.02 * dt
-                    self.vel.scale_to_length(self.initial_length * self.power)
-            if keys[pygame.K_DOWN]:
-                if self.power > 0.5:
-                    self.power -= mod * 0.02 * dt
-                    self.vel.scale_to_length(self.initial_length * self.power)
-
-        # Recalculate the collider rect each update
-        self.collider = pygame.Rect(self.pos.x + self.vel.x,
-                                    self.pos.y + self.vel.y,
-                                    self.global_rect.w,
-                                    self.global_rect.h)
-    def reset(self):
-        # Reset all attributes of the object and generate a new type
-        self.pos = Vector2(20, 400)
-        self.vel = Vector2(10, -10)
-        self.paused = True
-        self.power = 1
-        self.angle = 0
-        self.type = random.randint(0,2)
-        self.image = sprites.trash(self.type)
-
-    # Only flip if the object is moving
-    def flipy(self):
-        if self.vel != Vector2(0,0):
-            self.vel.y *= -1
-            self.vel.y *= 0.8
-            self.vel.x *= 0.66
+    Methods:
+        draw(surface: pygame.Surface = None) -> list[pygame.Rect]
+            Overrides the GameObject draw function to draw every piece with a single Surface.blits call
+    """
+    def __init__(self, parent, state):
+        super().__init__(parent, 0, 0)
+
+        self.state = state
+
+    def draw(self, surface=None):
+        surface = surface or self.game.surface
+        count = self.state.count
+        if not count:
+            return []
+
+        # Converting the arrays to lists once is much faster than reading numpy scalars one at a time
+        xs = self.state.x[:count].tolist()
+        ys = self.state.y[:count].tolist()
+        angles = self.state.angle[:count].tolist()
+        types = self.state.type[:count].tolist()
+
+        resolution = self.game.resolution
+        scale = resolution.scale
+        images = [resolution.image(sprites.trash(type)) for type in range(3)]
+        rotations = self.game.rotations
+        blits = []
+        for x, y, angle, type in zip(xs, ys, angles, types):
+            image, offset = rotations.get(images[type], angle)
+            blits.append((image, (x*scale + offset[0], y*scale + offset[1])))
+        return surface.blits(blits)
 
-class Bin(GameObject):
+class Game:
     """
-    Object representing a rubbish bin, the goal for the player to shoot the trash object into
+    The windowed game, a thin renderer and input layer on top of simulation.Simulation
 
     Attributes:
-        pos: Vector2
-            Position vector of the top left corner relative to the origin
+        sim: simulation.Simulation
+            The simulation holding all game state, stepped once per frame
 
-        type: int
-            Used to represent what type of bin this object is.
-            0 represents a landfill bin, 1 represents a recycling bin and 2 represents and organic bin.
-            This dictates what objects can and can't be thrown into the bin
-            !!! WARNING: This might not be implemented in time
+        trash: TrashObject, obstacles: list[Bin]
+            Sprites drawing the simulation objects
+
+        text: render.TextCache
+            Cache of fonts and rendered HUD text
+
+        display: pygame.Surface
+            The window
+
+        surface: pygame.Surface
+            Surface the current frame is drawn to, either the window or a smaller one stretched over it
+
+        resolution: render.AdaptiveResolution
+            Picks the scale frames are drawn at to keep up with the framerate. Everything is positioned in window
+            coordinates and only scaled when drawn, so the simulation never sees the render resolution
+
+        rotations: render.RotationCache
+            Cache of rotated sprites used by GameObject.draw
+
+        dots: render.DotCache
+            Cache of the antialiased orbs the trajectories are drawn with
+
+        dirty_rects: bool
+            If True frames are drawn with renderer, only updating the areas of the display that changed
+
+        renderer: render.DirtyRenderer
+            Renderer used for the dirty rectangle mode
+
+        layers: render.LayeredRenderer
+            Cached background and HUD layers frames are drawn over when not using dirty rectangles
+
+        idle: bool
+            Whether the last frame didn't change anything on screen, the framerate drops to IDLE_FPS while it is set
+
+        playback: replay.Replay
+            Recorded session to play back instead of reading the keyboard, None when playing normally
+
+        record: str, recording: replay.Replay
+            Path to save a recording of this session to when the game closes and the recording being made
+
+        frame: int
+            Number of frames simulated so far
+
+        startup_time: float
+            Seconds from importing the module to the first frame being on screen, None until then
+
+        profiler: profiler.Profiler
+            Times each phase of the frame for the overlay toggled with F3
+
+        profile_output: str
+            Path of a .csv or .json file every frame's timings are written to when the game closes, None to not keep them
+
+        assist: str
+            "assist" to show the trajectory of a throw that would score, "bot" to also aim and throw automatically,
+            None to play normally
+
+        autoplayer: autoplayer.Autoplayer
+            Searches for a throw that scores in the background for every new throw
+
+        assist_aim: autoplayer.Aim, assist_trajectory: list[tuple]
+            The throw found for the current layout and its predicted trajectory
+
+        barrage: Barrage
+            Sprite drawing the simulation's barrage, None when barrages are disabled
+
+        tick_rate: float, substeps: int
+            Physics ticks per second and simulation steps per tick. The simulation always moves by the same amount
+            of time per step no matter how fast frames are drawn, so gameplay doesn't depend on the framerate
+
+        max_fps: int
+            Cap on the number of frames drawn per second, 0 to draw as fast as possible (or as fast as vsync allows)
+
+        accumulator: float
+            Real time in seconds that hasn't been simulated yet, carried over to the next frame
+
+        pending_inputs: int
+            Edge triggered inputs from frames that didn't run a physics tick, passed to the next tick
+
+        scores: scores.ScoreStore
+            High scores and session stats, written to disk in the background. None when they aren't kept
+
+        session: collections.Counter, session_start: float
+            Simulation events since the current game started and the simulation time it started at
+
+        last_session: scores.Session
+            The game that just ended, highlighted on the leaderboard
+
+        telemetry: telemetry.TelemetryServer
+            Local server streaming every frame's state and taking inputs from its clients, None when not serving
 
     Methods:
-        check_collision(trash: TrashObject)
-            Checks the collision of the bin and the trash object. If the trash hits the main body then it bounces, if it hits the goal then a point is scored.
+        run_until_finished()
+            Runs the game loop until the window is closed
 
-    """
-    def __init__(self, parent, x, bin_type: int):
-        super().__init__(parent, x, SIZE_Y-sprites.BASE_BIN_SIZE,sprites.bin(bin_type))
-        self.pos = Vector2(x,SIZE_Y-sprites.BASE_BIN_SIZE)
+        run_frame(elapsed: float = None)
+            Runs a single frame of the game loop without waiting for the framerate cap, simulating the real time since
+            the last frame or elapsed seconds if given
 
-        self.type = bin_type
+        tick(inputs: int)
+            Advances the simulation by one physics tick
 
-    def check_collision(self, trash: TrashObject):
-        collider = pygame.Rect(self.global_rect.x+10,self.global_rect.y+10,self.global_rect.w-20,self.global_rect.h-20)
+        handle_events(events: list) -> int
+            Turns pygame events and pressed keys into a simulation input bitmask
 
-        if collider.colliderect(trash.collider):
-            if self.type == trash.type:
-                return 1
-            else:
-                return 2
+        assist_inputs() -> int
+            Runs the autoplayer's search and returns the bot's inputs
+
+        hud() -> dict
+            Returns the HUD text surfaces and where to draw them
+
+        draw(), draw_dirty()
+            Draws a frame, either redrawing everything or only what changed
+
+        sync_sprites()
+            Rebuilds the bin sprites when the simulation has generated a new layout
+    """
+    def __init__(self, seed=None, warm_rotations=False, dirty_rects=False, playback=None, record=None, profile_output=None,
+                 assist=None, barrage=0, tick_rate=FRAMECAP, substeps=1, max_fps=FRAMECAP, vsync=False,
+                 trajectory_balls=simulation.TRAJECTORY_BALLS, trajectory_spacing=1, pixel_collisions=False,
+                 min_scale=0.5, tier=None, score_log=None, telemetry_address=None):
+        # The autoplayer and the layout catalog solve throws against the bins' colliders, which pixel collisions
+        # replace, so they would aim for and rank throws the game doesn't play
+        if pixel_collisions and assist is not None:
+            raise ValueError("the autoplayer can't be used with pixel collisions")
+        if pixel_collisions and tier is not None:
+            raise ValueError("layouts can't be picked from the catalog with pixel collisions")
 
-class Game:
-    def __init__(self):
         self.running = False
-        self.surface = pygame.display.set_mode((SIZE_X,SIZE_Y)) # The window for all objects to be drawn to
+
+        # pygame is only initialised once a game is made so the module can be imported without a display
+        pygame.init()
+        pygame.font.init()
+
+        # The window for all objects to be drawn to. Not every display driver can wait for vsync
+        self.display = None
+        if vsync:
+            try:
+                self.display = pygame.display.set_mode((SIZE_X,SIZE_Y), pygame.SCALED, vsync=1)
+            except pygame.error:
+                logging.warning("vsync isn't available, drawing without it")
+        if self.display is None:
+            self.display = pygame.display.set_mode((SIZE_X,SIZE_Y))
+
+        # Images are still loaded on first use, but a missing one stops the game here instead of when it is drawn
+        sprites.check()
 
         # Window title and icon
         pygame.display.set_caption("Trash Tosser")
@@ -324,172 +409,496 @@ class Game:
 
         # Clock used to regular framerate
         self.clock = pygame.time.Clock()
-
-        self.trash = TrashObject(self, 20,400,10,-10, random.randint(0,2))
+        self.max_fps = max_fps
+
+        # Fixed physics timestep, each tick moves the simulation by FRAMECAP/tick_rate frames split into substeps
+        self.tick_rate = tick_rate
+        self.substeps = substeps
+        self.accumulator = 0
+        self.pending_inputs = 0
+
+        # Fonts and HUD text are cached so they are only loaded and rendered when they change
+        self.text = render.TextCache()
+
+        # Rotated sprites are cached, optionally rotating every trash sprite to every angle up front
+        self.rotations = render.RotationCache()
+        if warm_rotations:
+            for type in range(3):
+                self.rotations.warm(sprites.trash(type))
+        self.dots = render.DotCache()
+
+        # Optionally only redraw and update the parts of the screen that changed each frame
+        self.dirty_rects = dirty_rects
+        self.renderer = render.DirtyRenderer(self.display)
+
+        # Otherwise frames are built from cached layers, with nothing redrawn while nothing changes
+        self.layers = render.LayeredRenderer()
+        self.idle = False
+
+        # Frames are drawn at a lower resolution when they take longer than the framerate allows. Dirty rectangles
+        # are already only drawing what changed, so they always draw at full resolution
+        self.resolution = render.AdaptiveResolution(self.display, 1 / FRAMECAP, 1 if dirty_rects else min_scale)
+        self.surface = self.resolution.surface
+
+        # Either play back a recorded session or start a new game, optionally recording it
+        self.playback = playback
+        if playback is not None:
+            self.sim = playback.simulation()
+        else:
+            # Layouts are picked from the prebuilt catalog when a difficulty tier is chosen
+            catalog = None
+            if tier is not None:
+                catalog = layouts.load()
+                if catalog is None:
+                    raise FileNotFoundError(f"{layouts.CATALOG_PATH} hasn't been built, run layouts.py first")
+            shapes = sprites.collision_shapes() if pixel_collisions else None
+            self.sim = simulation.Simulation(seed, barrage_size=barrage, shapes=shapes, catalog=catalog,
+                                             tier=tier or 0)
+        self.record = record
+        self.recording = replay.Replay.of(self.sim) if record is not None else None
+        self.frame = 0
+        self.playback_due = 0 # Simulation frames of the recording that are due to be played but haven't been yet
+
+        # The trajectory preview only affects drawing, so it can be as long and dense as the player wants
+        self.sim.trash.trajectory_balls = trajectory_balls
+        self.sim.trash.trajectory_spacing = trajectory_spacing
+        self.trash = TrashObject(self, self.sim.trash)
         self.obstacles = []
-
-        self.score = 0
-        self.lives = 3
-
-        # Used to wait a second after the ball stops before restarting
-        self.ball_stopped = False
-        self.ball_stopped_at = 0
-
-        # Will be overwritten in the game loop
-        self.wrong_bin = (False, False)
-
-        self.state = 0
-        # 0 = Playing
-        # 1 = Game over
-
-        self.last_frame = time.time() # The time of the previous frame, used to calculate deltatime
-
+        self.generation = None # Simulation generation the bin sprites were built for
+        self.barrage = Barrage(self, self.sim.barrage) if self.sim.barrage is not None else None
+
+        self.last_frame = time.perf_counter() # The time of the previous frame, used to calculate how much to simulate
+
+        self.startup_time = None # Seconds from importing this module to the first frame being shown
+
+        # Frame timings, only collected while the overlay is shown (F3) or when they will be written to a file
+        self.profile_output = profile_output
+        self.profiler = profiler.Profiler(keep_frames=profile_output is not None)
+        self.overlay_lines = []
+        self.overlay_histogram = None # Surface with the histogram of recent frame times, made with the overlay lines
+
+        # Optional autoplayer that shows a throw that would score ("assist") or plays by itself ("bot")
+        self.assist = assist
+        self.autoplayer = autoplayer.Autoplayer() if assist is not None else None
+        self.assist_generation = None # Simulation generation the current search was started for
+        self.assist_future = None
+        self.assist_aim = None
+        self.assist_trajectory = []
+
+        # Finished games are saved to the score log, recorded sessions being played back aren't
+        self.scores = scores.ScoreStore(score_log) if score_log is not None and playback is None else None
+        self.session = Counter()
+        self.session_start = 0
+        self.last_session = None
+
+        # Optional local server for soak tests and dashboards, running on its own thread
+        self.telemetry = None
+        if telemetry_address is not None:
+            self.telemetry = telemetry.TelemetryServer(telemetry_address).start()
+            logging.info(f"Telemetry server listening on {self.telemetry.address}")
 
     def run_until_finished(self):
         self.running = True
-        # Initialise stage
-        self.reset()
         while self.running:
-            # Calculate the time since last frame and setting the last frame to now
-            current_frame = time.time()
-            dt = (current_frame-self.last_frame) * FRAMECAP
-            self.last_frame = current_frame
-
-            # Handle keypresses and get currently pressed down keys
-            keys = self.handle_events(pygame.event.get())
-
-            # Only calculate game logic if game is running (e.g. not in menu)
-            if self.state == 0:
-                scored = False
-
-                # Check the trash objects collision with each bin. Lose a life if the bin type is incorrect and gain a point if it is correct
-                for obstacle in self.obstacles:
-                    result = obstacle.check_collision(self.trash)
-                    # Represents a point scored and 2 represents a life lost
-                    if result == 1:
-                        self.score += 1
-                        scored = True # Make it so you can't lose a life if you scored already
-                        self.reset()
-                    elif result == 2 and not scored:
-                        if self.lives != 0:
-                            self.reset()
-                        self.lives -= 1
-                        # Display the wrong bin message for three seconds only
-                        self.wrong_bin = (True, time.time())
-
-                # If the ball isn't moving, wait 1 second before resetting and losing a life
-                if self.trash.vel == Vector2(0,0):
-                    if not self.ball_stopped:
-                        self.ball_stopped_at = time.time()
-                        self.ball_stopped = True
-                    if time.time() - self.ball_stopped_at > 1: # Wait 1 second
-                        self.ball_stopped = False
-                        self.lives -= 1
-                        if self.lives != 0:
-                            self.reset()
-
-                self.trash.update(dt, keys)
-
-                # Set state to gameover screen if no lives remain
-                if self.lives <= 0:
-                    self.state = 1
-
-                # Fill background in blue before rendering life and score information
-                self.surface.fill((0, 0, 128))
-
-                score_text = font(36).render(f"Score: {self.score}", True,(255,255,255))
-                self.surface.blit(score_text, (SIZE_X-200,50))
-
-                lives_text = font(36).render(f"Lives: {self.lives}", True, (255,255,255))
-                self.surface.blit(lives_text, (50, 50))
-
-                # Check the wrong bin message is being displayed. If it is and it has been 3 seconds since it was shown, stop showing it
-                if self.wrong_bin[0]:
-                    if time.time() - self.wrong_bin[1] > 3:
-                        self.wrong_bin = (False, False)
-                    else:
-                        wrong_bin_text = font(36).render("Wrong Bin!", True, (255,255,255))
-                        self.surface.blit(wrong_bin_text,(300,50))
-
-                for obstacle in self.obstacles:
-                    obstacle.draw()
+            self.profiler.begin_frame()
+            self.run_frame()
+
+            # Cap the framerate, drawing has no effect on the simulation so it can run faster or slower than the physics
+            # Nothing on screen changes while idle, so input is only checked a few times a second
+            fps = self.max_fps
+            if self.idle:
+                fps = min(fps, IDLE_FPS) if fps else IDLE_FPS
+            with self.profiler.scope("idle"):
+                self.clock.tick(fps)
+            self.profiler.end_frame()
+
+        if self.recording is not None:
+            self.recording.finish(self.sim)
+            self.recording.save(self.record)
+        if self.profile_output is not None:
+            self.profiler.export(self.profile_output)
+        if self.autoplayer is not None:
+            self.autoplayer.close()
+        if self.scores is not None:
+            self.scores.close()
+        if self.telemetry is not None:
+            self.telemetry.close()
+
+    def run_frame(self, elapsed=None):
+        """Handles input, runs however many physics ticks have built up and draws a single frame"""
+        # Measure the real time since the last frame with a monotonic high resolution clock
+        current_frame = time.perf_counter()
+        if elapsed is None:
+            elapsed = current_frame - self.last_frame
+        self.last_frame = current_frame
+        self.accumulator += min(elapsed, MAX_FRAME_TIME)
+
+        # Handle keypresses and turn them into simulation inputs
+        with self.profiler.scope("events"):
+            inputs = self.handle_events(pygame.event.get())
+            if self.autoplayer is not None and self.playback is None:
+                inputs |= self.assist_inputs()
+
+        # Keypresses are kept until a tick runs, held keys apply to every tick
+        self.pending_inputs |= inputs & simulation.EDGE_TRIGGERED
+        held = inputs & ~simulation.EDGE_TRIGGERED
+
+        tick_time = 1 / self.tick_rate
+        with self.profiler.scope("simulation"):
+            while self.accumulator >= tick_time:
+                self.accumulator -= tick_time
+                self.tick(held | self.pending_inputs)
+                self.pending_inputs = 0
+
+                # Stop once a recorded session has been played to the end
+                if self.playback is not None and self.frame >= len(self.playback):
+                    self.running = False
+                    return
+
+            # Draw the sprites part of the way between the last two physics states
+            self.sync_sprites(self.accumulator / tick_time)
+
+        if self.dirty_rects:
+            self.draw_dirty()
+        else:
+            self.draw()
+            # How long this frame took to make, not counting waiting for the framerate cap
+            self.resolution.measure(time.perf_counter() - current_frame)
+
+        if self.telemetry is not None:
+            self.publish_telemetry(elapsed)
+
+        if self.startup_time is None:
+            self.startup_time = time.perf_counter() - STARTED
+            logging.info(f"First frame {self.startup_time*1000:.1f}ms after import")
+
+    def tick(self, inputs):
+        """Steps the simulation by one physics tick split into substeps, remembering where the trash was before it"""
+        trash = self.sim.trash
+        previous = (trash.x, trash.y, trash.angle)
+        generation = self.sim.generation
+
+        for step_inputs, dt in self.tick_steps(inputs):
+            if self.recording is not None:
+                self.recording.record(step_inputs, dt)
+            self.frame += 1
+
+            # Events are counted for the session stats saved when the game ends
+            state = self.sim.state
+            self.session.update(self.sim.step(step_inputs, dt))
+            if state != self.sim.state and self.sim.state == simulation.GAME_OVER:
+                self.end_session()
+            elif state != self.sim.state:
+                self.start_session()
+
+        # The trash jumps back to the start when it is reset so it shouldn't be drawn sliding there
+        self.trash.previous = previous if generation == self.sim.generation else None
+
+    def tick_steps(self, inputs):
+        """
+        :return steps: list[(int, float)]:
+        Inputs and timestep of every substep of a tick
+
+        When playing back a session the recorded steps replace them, as many as it takes to cover the length of a tick
+        so a session plays at the speed it was recorded whatever tick rate and substeps either game used
+        """
+        tick_frames = FRAMECAP / self.tick_rate
+        if self.playback is None:
+            return [(inputs if substep == 0 else inputs & ~simulation.EDGE_TRIGGERED, tick_frames / self.substeps)
+                    for substep in range(self.substeps)]
+
+        steps = []
+        self.playback_due += tick_frames
+        # A small tolerance so steps summing to a tick with rounding error don't leave one behind for the next tick
+        while self.playback_due > 1e-9 and self.frame + len(steps) < len(self.playback):
+            index = self.frame + len(steps)
+            steps.append((self.playback.inputs[index], self.playback.dts[index]))
+            self.playback_due -= self.playback.dts[index]
+        return steps
+
+    def publish_telemetry(self, elapsed):
+        """Sends this frame's state to the telemetry clients, only building it when someone is connected"""
+        if not self.telemetry.client_count:
+            return
+        trash = self.sim.trash
+        self.telemetry.publish({
+            "frame": self.frame,
+            "time": self.sim.time,
+            "x": trash.x, "y": trash.y, "vx": trash.vx, "vy": trash.vy, "angle": trash.angle,
+            "score": self.sim.score,
+            "lives": self.sim.lives,
+            "state": self.sim.state,
+            "frame_ms": elapsed * 1000,
+            "scale": self.resolution.scale,
+            "phases_ms": self.profiler.last(),
+            "dropped": self.telemetry.dropped,
+        })
+
+    def start_session(self):
+        self.session = Counter()
+        self.session_start = self.sim.time
+
+    def end_session(self):
+        """Queues the game that just ended to be saved, which never waits for the disk"""
+        if self.scores is None:
+            return
+        self.last_session = scores.Session(
+            time.time(), self.sim.seed, self.sim.score, self.session[simulation.SCORED],
+            self.session[simulation.WRONG_BIN], self.session[simulation.STOPPED], self.sim.time - self.session_start
+        )
+        self.scores.add(self.last_session)
 
+    def hud(self):
+        """
+        :return hud: dict:
+        The HUD text to show for the current state, name -> (text surface, rect)
+        """
+        scale = self.resolution.scale
+
+        def text(string, size, anchor, position, color=(255,255,255)):
+            # Text is rendered at the render resolution and its anchor ("topleft", "center"...) put at the scaled position
+            surface = self.text.render(string, round(size*scale), color)
+            return surface, surface.get_rect(**{anchor: (position[0]*scale, position[1]*scale)})
+
+        hud = {}
+        hud["score"] = text(f"Score: {self.sim.score}", 36, "topleft", (SIZE_X-200,50))
+
+        if self.sim.state == simulation.PLAYING:
+            hud["lives"] = text(f"Lives: {self.sim.lives}", 36, "topleft", (50, 50))
+
+            # Barrage pieces in the right bin are counted apart from the score
+            if self.sim.barrage is not None:
+                hud["barrage"] = text(f"Barrage: {self.sim.barrage.scored}", 28, "topleft", (SIZE_X-200,90))
+
+            # The simulation keeps track of how long the wrong bin message has been shown for
+            if self.sim.wrong_bin:
+                hud["wrong_bin"] = text("Wrong Bin!", 36, "topleft", (300,50))
+
+        # Draw game over screen
+        elif self.sim.state == simulation.GAME_OVER:
+            hud["gameover"] = text("GAME OVER", 72, "center", (SIZE_X/2,SIZE_Y/2))
+            hud["restart"] = text("Press R to restart", 36, "center", (SIZE_X/2,SIZE_Y/2+100))
+
+            # Best scores under the score, read from memory so the disk is never waited on
+            if self.scores is not None:
+                hud["leaderboard"] = text("High scores", 28, "topleft", (SIZE_X-200,100))
+                for i, session in enumerate(self.scores.top(LEADERBOARD_SIZE)):
+                    color = (255,255,0) if session == self.last_session else (255,255,255)
+                    hud[f"leaderboard{i}"] = text(f"{i+1}. {session.score}", 28, "topleft", (SIZE_X-200,130+i*28), color)
+
+        # Frame timings under the lives, only updated a few times a second so the numbers can be read
+        if self.profiler.overlay:
+            size = (round(200*scale), round(40*scale))
+            if self.frame % 15 == 0 or not self.overlay_lines or self.overlay_histogram.get_size() != size:
+                limit = 2000 / (self.max_fps or FRAMECAP)
+                self.overlay_lines = self.profiler.lines() + [f"Scale {scale:.0%}", f"frame times 0-{limit:.0f} ms"]
+                self.overlay_histogram = render.histogram(
+                    self.profiler.histogram("frame", HISTOGRAM_BUCKETS, limit), size, (255,255,0))
+            for i, line in enumerate(self.overlay_lines):
+                hud[f"profiler{i}"] = text(line, 16, "topleft", (50, 100+i*18), (255,255,0))
+
+            # Rolling histogram of the frame times under the lines
+            top = 100 + len(self.overlay_lines)*18 + 4
+            hud["profiler_histogram"] = self.overlay_histogram, self.overlay_histogram.get_rect(
+                topleft=(50*scale, top*scale))
+
+        return hud
+
+    def draw_background(self, surface):
+        """Draws everything that doesn't move between resets, the background colour and the bins"""
+        surface.fill(BACKGROUND)
+        if self.sim.state == simulation.PLAYING:
+            for obstacle in self.obstacles:
+                obstacle.draw(surface)
+
+    def draw(self):
+        """Draws the frame over the cached background and HUD layers and updates the whole display"""
+        with self.profiler.scope("hud"):
+            hud = self.hud()
+
+        with self.profiler.scope("draw"):
+            # Draw at whatever resolution the last frames' timings picked
+            self.surface = self.resolution.surface
+
+            # The background, bins and HUD only change on resets and when the text changes, so they are drawn from
+            # cached layers. Nothing moves on the game over screen so it is only drawn once
+            playing = self.sim.state == simulation.PLAYING
+            key = (self.generation, self.sim.state, self.resolution.scale)
+            self.idle = not self.layers.begin(self.surface, key, self.draw_background, hud, playing)
+            if self.idle:
+                return
+
+            if playing:
                 self.trash.draw()
+                if self.barrage is not None:
+                    self.barrage.draw()
 
-            # Draw game over screen if state = 1
-            elif self.state == 1:
-                self.surface.fill((0, 0, 128))
+        with self.profiler.scope("display"):
+            self.resolution.present()
+            pygame.display.update()
 
-                score_text = font(36).render(f"Score: {self.score}", True,(255,255,255))
-                self.surface.blit(score_text, (SIZE_X-200,50))
+    def draw_dirty(self):
+        """Redraws and updates only the areas of the display that changed since the last frame"""
+        with self.profiler.scope("hud"):
+            hud = self.hud()
 
-                gameover_text = font(72).render("GAME OVER", True, (255,255,255))
-                self.surface.blit(gameover_text, gameover_text.get_rect(center=(SIZE_X/2,SIZE_Y/2)))
+        with self.profiler.scope("draw"):
+            # The background only changes when the bins are regenerated or the game ends
+            self.renderer.begin((self.generation, self.sim.state), self.draw_background, hud)
+            self.idle = self.sim.state != simulation.PLAYING and not self.renderer.dirty
 
-                restart_text = font(36).render("Press R to restart", True, (255,255,255))
-                self.surface.blit(restart_text,restart_text.get_rect(center=(SIZE_X/2,SIZE_Y/2+100)))
+            if self.sim.state == simulation.PLAYING:
+                self.renderer.add(self.trash.draw())
+                if self.barrage is not None:
+                    self.renderer.add(self.barrage.draw())
 
-            # Update display and cap the framerate
-            pygame.display.update()
-            self.clock.tick(FRAMECAP)
+        with self.profiler.scope("display"):
+            self.renderer.finish()
+
+    def assist_inputs(self):
+        """
+        :return inputs: int:
+        Inputs from the bot, 0 in assist mode or while it is still searching
+
+        Starts a search for every new throw and picks up the aim once the search has finished
+        """
+        if self.sim.state == simulation.GAME_OVER:
+            return simulation.RESTART if self.assist == "bot" else 0
+
+        trash = self.sim.trash
+        if self.assist_generation != self.sim.generation:
+            self.assist_generation = self.sim.generation
+            self.assist_aim = None
+            self.assist_trajectory = []
+            if self.assist_future is not None:
+                self.assist_future.cancel()
+            self.assist_future = self.autoplayer.submit(self.sim.bins, trash.type, self.sim.seed + self.sim.generation)
+
+        if self.assist_future is not None:
+            if not self.assist_future.done():
+                return 0
+            self.assist_aim = self.assist_future.result()
+            self.assist_future = None
+            if self.assist_aim is not None:
+                # Predict the trajectory of the aim from where the trash is being thrown
+                ghost = simulation.Trash(trash.x, trash.y, 10, -10, trash.type)
+                ghost.trajectory_balls = trash.trajectory_balls
+                ghost.trajectory_spacing = trash.trajectory_spacing
+                ghost.aim(self.assist_aim.angle, self.assist_aim.power)
+                self.assist_trajectory = ghost.trajectory()
+
+        if self.assist != "bot" or not trash.paused:
+            return 0
+        # Throw anyway if nothing was found that scores
+        if self.assist_aim is None:
+            return simulation.LAUNCH
+        return autoplayer.aim_inputs(trash, self.assist_aim)
 
     def handle_events(self, events):
         """
         :param events: list:
         List of pygame events such as keyups, keydowns
 
-        :return keys: list:
-        List of currently pressed down keys
+        :return inputs: int:
+        Bitmask of simulation input flags for this frame
 
-        Handles all pygame events, such as quitting the game, restarting the game if on the game over screen, etc..
+        Handles all pygame events, such as quitting the game, and turns launching, restarting and held down keys into simulation inputs
         """
+        inputs = 0
         for event in events:
             if event.type == pygame.QUIT:
                 self.running=False
 
             if event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_SPACE:
-                    self.trash.paused = False
-                    self.trash.old_trajectory = self.trash.trajectory
-                if event.key == pygame.K_r and self.state == 1:
-                    self.reset()
-                    self.state = 0
-                    self.score = 0
-                    self.lives = 3
-
-        return pygame.key.get_pressed()
-
-    def gen_bins(self):
-        """Generates bin objects and continually regenerates them until none of them are overlapping"""
-        obstacles = []
-
-        # One bin for each type
-        for type in range(3):
-            collided = False
-            new_bin = Bin(self, random.randint(400,SIZE_X-sprites.BASE_BIN_SIZE*2), type)
-
-            # Check collision with each other existing bin
-            for bin in obstacles:
-                if bin.global_rect.colliderect(new_bin.global_rect):
-                    collided = True
-
-            # Keep regenerating and checking until it doesnt overlap any other bin
-            while collided:
-                new_bin = Bin(self, random.randint(400, SIZE_X - sprites.BASE_BIN_SIZE * 2), type)
-                collided = False
-                for bin in obstacles:
-                    if bin.global_rect.colliderect(new_bin.global_rect):
-                        collided = True
-            obstacles.append(new_bin)
-        self.obstacles = obstacles
-
-    def reset(self):
-        self.trash.reset()
-        self.gen_bins()
+                    inputs |= simulation.LAUNCH
+                if event.key == pygame.K_r:
+                    inputs |= simulation.RESTART
+                if event.key == pygame.K_b:
+                    inputs |= simulation.BARRAGE
+                # Show or hide the frame timing overlay
+                if event.key == pygame.K_F3:
+                    self.profiler.toggle_overlay()
+
+        keys = pygame.key.get_pressed()
+        for key, flag in KEY_INPUTS.items():
+            if keys[key]:
+                inputs |= flag
+
+        # Inputs sent by telemetry clients since the last frame
+        if self.telemetry is not None:
+            remote, quit = self.telemetry.inputs()
+            inputs |= remote
+            if quit:
+                self.running = False
+        return inputs
+
+    def sync_sprites(self, alpha=1):
+        """
+        Copies simulation state onto the sprites, rebuilding the bins whenever a new layout has been generated
+        alpha is how far between the last two physics ticks to draw the trash
+        """
+        if self.generation != self.sim.generation:
+            self.generation = self.sim.generation
+            self.obstacles = [Bin(self, state) for state in self.sim.bins]
+        self.trash.update(alpha)
 
 
 # Only start game if file is directly run rather than imported.
 if __name__ == "__main__":
-    game = Game()
+    parser = argparse.ArgumentParser(description="Trash Tosser")
+    parser.add_argument("--seed", type=int, help="seed for the trash types and bin layouts")
+    parser.add_argument("--record", metavar="PATH", help="record the session to a replay file")
+    parser.add_argument("--replay", metavar="PATH", help="watch a recorded session")
+    parser.add_argument("--dirty-rects", action="store_true", help="only redraw the parts of the screen that change")
+    parser.add_argument("--warm-rotations", action="store_true",
+                        help="rotate every trash sprite to every angle at startup instead of on first use")
+    parser.add_argument("--profile", metavar="PATH", help="write every frame's phase timings to a .csv or .json file on exit")
+    parser.add_argument("--assist", choices=["assist", "bot"], help="show a throw that would score, or let the bot play")
+    parser.add_argument("--barrage", type=int, default=0, metavar="COUNT",
+                        help="press B to throw COUNT pieces of trash at once around the aim")
+    parser.add_argument("--tick-rate", type=float, default=FRAMECAP, help="physics ticks per second")
+    parser.add_argument("--substeps", type=int, default=1, help="simulation steps per physics tick")
+    parser.add_argument("--max-fps", type=int, default=FRAMECAP, help="cap on frames drawn per second, 0 for no cap")
+    parser.add_argument("--vsync", action="store_true", help="wait for the display's refresh between frames")
+    parser.add_argument("--trajectory-balls", type=int, default=simulation.TRAJECTORY_BALLS,
+                        help="number of orbs in the trajectory preview")
+    parser.add_argument("--trajectory-spacing", type=float, default=1, help="frames between trajectory orbs")
+    parser.add_argument("--pixel-collisions", action="store_true",
+                        help="collide with the shapes of the bins, bouncing off them unless the trash lands in the top")
+    parser.add_argument("--tier", type=int, help="pick layouts of this difficulty from the layout catalog, 0 is the easiest")
+    parser.add_argument("--scores", metavar="PATH", default=scores.SCORES_PATH, help="file to keep high scores in")
+    parser.add_argument("--no-scores", action="store_true", help="don't save or show high scores")
+    parser.add_argument("--telemetry", metavar="ADDRESS",
+                        help="stream telemetry and take inputs on a local host:port or Unix socket path")
+    parser.add_argument("--min-scale", type=float, default=0.5,
+                        help="lowest resolution to draw at when frames are slow, relative to the window, 1 to never lower it")
+    args = parser.parse_args()
+    if args.pixel_collisions and args.assist is not None:
+        parser.error("--assist can't be used with --pixel-collisions, the autoplayer aims for the bins' colliders")
+    if args.pixel_collisions and args.tier is not None:
+        parser.error("--tier can't be used with --pixel-collisions, the catalog is ranked using the bins' colliders")
+
+    game = Game(
+        args.seed,
+        warm_rotations=args.warm_rotations,
+        dirty_rects=args.dirty_rects,
+        playback=replay.Replay.load(args.replay) if args.replay else None,
+        record=args.record,
+        profile_output=args.profile,
+        assist=args.assist,
+        barrage=args.barrage,
+        tick_rate=args.tick_rate,
+        substeps=args.substeps,
+        max_fps=args.max_fps,
+        vsync=args.vsync,
+        trajectory_balls=args.trajectory_balls,
+        trajectory_spacing=args.trajectory_spacing,
+        pixel_collisions=args.pixel_collisions,
+        min_scale=args.min_scale,
+        tier=args.tier,
+        score_log=None if args.no_scores else args.scores,
+        telemetry_address=args.telemetry
+    )
     game.run_until_finished()
-    pygame.quit()
\ No newline at end of file
+    pygame.quit()